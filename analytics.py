@@ -0,0 +1,193 @@
+"""Sales analytics over NumPy columns.
+
+Order lines from both the hot and archive tiers are loaded once into column arrays and
+topped up by order_id high-water mark, so each report is a handful of vectorised group-bys
+instead of a SQL scan.
+"""
+import threading
+
+import numpy as np
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+COLUMNS = (
+    ('order_id', np.int64),
+    ('timestamp', np.int64),
+    ('product_id', np.int64),
+    ('quantity', np.int64),
+    ('revenue', np.float64),
+)
+
+
+class SalesColumns:
+    """Append-only column store of order lines; arrays grow by doubling."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset(None)
+
+    def reset(self, source):
+        self.source = source
+        self.high_water = 0
+        self.size = 0
+        self.arrays = {name: np.empty(0, dtype) for name, dtype in COLUMNS}
+
+    def refresh(self, conn):
+        with self.lock:
+            source = getattr(conn, 'db_path', None)
+            if source != self.source:
+                self.reset(source)
+            cursor = conn.execute(
+                "SELECT d.order_id, o.order_date, d.product_id, d.quantity, d.quantity * d.price_at_sale "
+                "FROM all_order_details d JOIN all_orders o ON o.order_id = d.order_id "
+                "WHERE d.order_id > ? ORDER BY d.order_id",
+                (self.high_water,),
+            )
+            cursor.row_factory = None
+            rows = cursor.fetchall()
+            if rows:
+                order_id, order_date, product_id, quantity, revenue = zip(*rows)
+                self._append({
+                    'order_id': np.array(order_id, np.int64),
+                    'timestamp': np.array(order_date, 'datetime64[s]').astype(np.int64),
+                    'product_id': np.array(product_id, np.int64),
+                    'quantity': np.array(quantity, np.int64),
+                    'revenue': np.array(revenue, np.float64),
+                })
+                self.high_water = order_id[-1]
+            return {name: array[:self.size] for name, array in self.arrays.items()}
+
+    def _append(self, columns):
+        added = len(columns['order_id'])
+        needed = self.size + added
+        capacity = len(self.arrays['order_id'])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2, 1024)
+            for name, dtype in COLUMNS:
+                grown = np.empty(capacity, dtype)
+                grown[:self.size] = self.arrays[name][:self.size]
+                self.arrays[name] = grown
+        for name, values in columns.items():
+            self.arrays[name][self.size:needed] = values
+        self.size = needed
+
+
+sales = SalesColumns()
+
+
+def _window(columns, start, end):
+    timestamp = columns['timestamp']
+    mask = (timestamp >= start) & (timestamp < end)
+    return {name: array[mask] for name, array in columns.items()}
+
+
+def _first_lines(order_id):
+    # Lines are ordered by order_id, so the first line of each order marks one order
+    first = np.ones(len(order_id), bool)
+    first[1:] = order_id[1:] != order_id[:-1]
+    return first
+
+
+def _product_totals(lines):
+    size = int(lines['product_id'].max()) + 1 if len(lines['product_id']) else 0
+    quantity = np.bincount(lines['product_id'], weights=lines['quantity'], minlength=size)
+    revenue = np.bincount(lines['product_id'], weights=lines['revenue'], minlength=size)
+    return quantity, revenue
+
+
+def _names(conn, product_ids):
+    if not product_ids:
+        return {}
+    placeholders = ",".join("?" for _ in product_ids)
+    cursor = conn.execute(f"SELECT product_id, name FROM products WHERE product_id IN ({placeholders})", product_ids)
+    cursor.row_factory = None
+    return dict(cursor.fetchall())
+
+
+def top_products(conn, start, end, limit=10, by='revenue'):
+    lines = _window(sales.refresh(conn), start, end)
+    quantity, revenue = _product_totals(lines)
+    metric = revenue if by == 'revenue' else quantity
+    ranked = [int(p) for p in np.argsort(-metric, kind='stable')[:limit] if metric[p] > 0]
+    names = _names(conn, ranked)
+    total = float(revenue.sum())
+    return [
+        {
+            'product_id': product_id,
+            'name': names.get(product_id),
+            'quantity': int(quantity[product_id]),
+            'revenue': round(float(revenue[product_id]), 2),
+            'share': round(float(revenue[product_id]) / total, 4) if total else 0.0,
+        }
+        for product_id in ranked
+    ]
+
+
+def heatmap(conn, start, end, utc_offset=0):
+    """Orders and revenue by local weekday (rows, Monday first) and hour (columns)."""
+    lines = _window(sales.refresh(conn), start, end)
+    local = lines['timestamp'] + utc_offset * 60
+    # 1970-01-01 was a Thursday, hence the +3 to make Monday zero
+    cell = ((local // 86400 + 3) % 7) * 24 + (local // 3600) % 24
+    revenue = np.bincount(cell, weights=lines['revenue'], minlength=168)
+    first = _first_lines(lines['order_id'])
+    orders = np.bincount(cell[first], minlength=168)
+    return {
+        'weekdays': list(WEEKDAYS),
+        'orders': orders.reshape(7, 24).tolist(),
+        'revenue': np.round(revenue, 2).reshape(7, 24).tolist(),
+    }
+
+
+def ingredient_unit_costs(conn):
+    cursor = conn.execute(
+        "SELECT ingredient_id, SUM(cost) / SUM(quantity_added) FROM supplies "
+        "WHERE cost IS NOT NULL AND quantity_added > 0 GROUP BY ingredient_id"
+    )
+    cursor.row_factory = None
+    return dict(cursor.fetchall())
+
+
+def margins(conn, start, end):
+    """Revenue, ingredient cost and margin per product sold in the window.
+
+    Ingredient cost uses current recipes and the quantity-weighted average supply price;
+    products without a recipe or using an ingredient that was never costed are marked incomplete.
+    """
+    lines = _window(sales.refresh(conn), start, end)
+    quantity, revenue = _product_totals(lines)
+    cursor = conn.execute("SELECT product_id, ingredient_id, quantity_required FROM recipes")
+    cursor.row_factory = None
+    recipes = cursor.fetchall()
+    unit_costs = ingredient_unit_costs(conn)
+    size = len(quantity)
+    unit_cost = np.zeros(size)
+    uncosted = np.ones(size, bool)
+    if recipes and size:
+        product_id, ingredient_id, required = (np.array(column) for column in zip(*recipes))
+        cost = np.array([unit_costs.get(i, np.nan) for i in ingredient_id.tolist()], np.float64)
+        sold = product_id < size
+        product_id, required, cost = product_id[sold], required[sold], cost[sold]
+        unit_cost = np.bincount(product_id, weights=np.nan_to_num(required * cost), minlength=size)
+        # A product without a recipe has no known cost either
+        has_recipe = np.bincount(product_id, minlength=size) > 0
+        uncosted = (np.bincount(product_id, weights=np.isnan(cost), minlength=size) > 0) | ~has_recipe
+    ingredient_cost = quantity * unit_cost
+    margin = revenue - ingredient_cost
+    sold_ids = [int(p) for p in np.flatnonzero(quantity)]
+    names = _names(conn, sold_ids)
+    report = [
+        {
+            'product_id': product_id,
+            'name': names.get(product_id),
+            'quantity': int(quantity[product_id]),
+            'revenue': round(float(revenue[product_id]), 2),
+            'unit_cost': round(float(unit_cost[product_id]), 4),
+            'ingredient_cost': round(float(ingredient_cost[product_id]), 2),
+            'margin': round(float(margin[product_id]), 2),
+            'margin_pct': round(float(margin[product_id] / revenue[product_id]), 4) if revenue[product_id] else None,
+            'cost_complete': not bool(uncosted[product_id]),
+        }
+        for product_id in sold_ids
+    ]
+    report.sort(key=lambda row: row['margin'], reverse=True)
+    return report
@@ -1,110 +1,777 @@
+import argparse
+import asyncio
+import io
 import json
 import os
 import sqlite3
 import base64
+import csv
+import email.utils
+import getpass
+import gzip
 import hmac
 import hashlib
+import mimetypes
+import mmap
+import posixpath
+import queue
+import re
+import selectors
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse, parse_qs, unquote
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "database.sqlite")
 SECRET_KEY = os.environ.get("APP_SECRET", "super-secret-key")
 FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "frontend")
+TOKEN_TTL = int(os.environ.get("APP_TOKEN_TTL", str(12 * 3600)))
+TOKEN_CACHE_SIZE = int(os.environ.get("APP_TOKEN_CACHE_SIZE", "4096"))
+AUTH_WORKERS = int(os.environ.get("APP_AUTH_WORKERS", "2"))
+AUTH_QUEUE_LIMIT = int(os.environ.get("APP_AUTH_QUEUE_LIMIT", "32"))
+PBKDF2_ITERATIONS = 100000
+KEEPALIVE_TIMEOUT = float(os.environ.get("APP_KEEPALIVE_TIMEOUT", "30"))
+ASYNC_WORKERS = int(os.environ.get("APP_ASYNC_WORKERS", "32"))
+STATIC_CACHE_BYTES = int(os.environ.get("APP_STATIC_CACHE_BYTES", str(32 * 1024 * 1024)))
+STATIC_MAX_FILE_BYTES = int(os.environ.get("APP_STATIC_MAX_FILE_BYTES", str(4 * 1024 * 1024)))
+STATIC_MAX_AGE = int(os.environ.get("APP_STATIC_MAX_AGE", "0"))
+SLOW_QUERY_SECONDS = float(os.environ.get("APP_SLOW_QUERY_MS", "50")) / 1000
+PROFILER_INTERVAL = float(os.environ.get("APP_PROFILER_INTERVAL", "0.005"))
+DB_POOL_SIZE = int(os.environ.get("APP_DB_POOL_SIZE", "16"))
+DB_BUSY_TIMEOUT = float(os.environ.get("APP_DB_BUSY_TIMEOUT", "5.0"))
+DB_JOURNAL_MODE = os.environ.get("APP_DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.environ.get("APP_DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE = int(os.environ.get("APP_DB_CACHE_SIZE", "-16384"))
+DB_MMAP_SIZE = int(os.environ.get("APP_DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+EVENT_QUEUE_SIZE = int(os.environ.get("APP_EVENT_QUEUE_SIZE", "256"))
+EVENT_MAX_CLIENTS = int(os.environ.get("APP_EVENT_MAX_CLIENTS", "64"))
+EVENT_HEARTBEAT = float(os.environ.get("APP_EVENT_HEARTBEAT", "15"))
+EVENT_POLL_INTERVAL = 1.0
+ORDER_WRITER = os.environ.get("APP_ORDER_WRITER") == "1"
+ORDER_BATCH_SIZE = int(os.environ.get("APP_ORDER_BATCH_SIZE", "32"))
+ORDER_BATCH_WINDOW = float(os.environ.get("APP_ORDER_BATCH_WINDOW_MS", "2")) / 1000
+ORDER_TIMEOUT = float(os.environ.get("APP_ORDER_TIMEOUT", "30"))
+WORKERS = int(os.environ.get("APP_WORKERS", "1"))
+GRACEFUL_TIMEOUT = float(os.environ.get("APP_GRACEFUL_TIMEOUT", "10"))
+SNAPSHOT_INTERVAL = float(os.environ.get("APP_SNAPSHOT_INTERVAL", "3600"))
+ARCHIVE_DB_PATH = os.environ.get("APP_ARCHIVE_DB")
+ARCHIVE_AFTER_DAYS = int(os.environ.get("APP_ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("APP_ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_CACHE_SIZE = int(os.environ.get("APP_ARCHIVE_CACHE_SIZE", "-2048"))
+POOL_WORKERS = int(os.environ.get("APP_POOL_WORKERS", "16"))
+POOL_RESERVED_WORKERS = int(os.environ.get("APP_POOL_RESERVED_WORKERS", "2"))
+POOL_QUEUE_LIMIT = int(os.environ.get("APP_POOL_QUEUE_LIMIT", "128"))
+POOL_QUEUE_TIMEOUT = float(os.environ.get("APP_POOL_QUEUE_TIMEOUT", "2"))
+POOL_RETRY_AFTER = int(os.environ.get("APP_POOL_RETRY_AFTER", "1"))
+MAX_REQUEST_HEAD = int(os.environ.get("APP_MAX_REQUEST_HEAD", "65536"))
+MAX_REQUEST_BODY = int(os.environ.get("APP_MAX_REQUEST_BODY", str(32 * 1024 * 1024)))
+IDEMPOTENCY_TTL = int(os.environ.get("APP_IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("APP_IDEMPOTENCY_CACHE_SIZE", "4096"))
+SEED_DEMO_DATA = os.environ.get("APP_SEED", "1") == "1"
+
+
+class AuthBusyError(RuntimeError):
+    pass
+
+
+_auth_executor = None
+_auth_lock = threading.Lock()
+_auth_slots = threading.BoundedSemaphore(AUTH_WORKERS + AUTH_QUEUE_LIMIT)
+
 
+def _pbkdf2(password, salt):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS)
 
-def hash_password(password: str) -> str:
+
+def run_pbkdf2(password, salt):
+    global _auth_executor
+    if _auth_executor is None:
+        with _auth_lock:
+            if _auth_executor is None:
+                _auth_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="auth")
+    if not _auth_slots.acquire(timeout=5):
+        raise AuthBusyError("Сервер зайнятий, спробуйте ще раз")
+    try:
+        return _auth_executor.submit(_pbkdf2, password, salt).result()
+    finally:
+        _auth_slots.release()
+
+
+def hash_password(password: str, derive=run_pbkdf2) -> str:
     salt = os.urandom(16)
-    dk = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100000)
+    dk = derive(password, salt)
     return base64.b64encode(salt + dk).decode()
 
 
+def check_password(password: str, password_hash: str) -> bool:
+    stored = base64.b64decode(password_hash.encode())
+    salt, stored_dk = stored[:16], stored[16:]
+    return hmac.compare_digest(stored_dk, run_pbkdf2(password, salt))
+
+
 def dict_factory(cursor, row):
-    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+    # description is one tuple per executed statement, so the key tuple is built once, not per row
+    description = cursor.description
+    if cursor.fields_for is not description:
+        cursor.fields_for = description
+        cursor.fields = tuple(col[0] for col in description)
+    return dict(zip(cursor.fields, row))
+
+
+def fetch_columnar(cursor, extra=()):
+    cursor.row_factory = None
+    rows = cursor.fetchall()
+    return {"columns": [col[0] for col in cursor.description] + list(extra), "rows": rows}
+
+
+def dump_json(data):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def prometheus_labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.active = {}
+        self.requests = {}
+        self.latency = {}
+        self.sql = {}
+        self.slow_queries = deque(maxlen=25)
+        self.shed = {}
+        self.idempotency = {}
+
+    def begin_request(self, route):
+        self.local.route = route
+        self.active[threading.get_ident()] = route
+
+    def end_request(self, method, route, status, seconds):
+        self.local.route = None
+        self.active.pop(threading.get_ident(), None)
+        index = 0
+        while index < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[index]:
+            index += 1
+        with self.lock:
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.get((method, route))
+            if histogram is None:
+                histogram = self.latency[(method, route)] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += seconds
+
+    def record_shed(self, priority):
+        with self.lock:
+            self.shed[priority] = self.shed.get(priority, 0) + 1
+
+    def record_idempotency(self, outcome):
+        with self.lock:
+            self.idempotency[outcome] = self.idempotency.get(outcome, 0) + 1
+
+    def observe_sql(self, statement, seconds):
+        route = getattr(self.local, 'route', None) or 'background'
+        with self.lock:
+            entry = self.sql.get(route)
+            if entry is None:
+                entry = self.sql[route] = [0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds >= SLOW_QUERY_SECONDS:
+                entry[2] += 1
+                self.slow_queries.append((route, " ".join(statement.split())[:200], seconds))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            lines += [
+                "# HELP cafe_http_requests_total HTTP requests by route and status.",
+                "# TYPE cafe_http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f"cafe_http_requests_total{prometheus_labels(method=method, route=route, status=status)} {count}")
+            lines += [
+                "# HELP cafe_http_request_duration_seconds HTTP request latency.",
+                "# TYPE cafe_http_request_duration_seconds histogram",
+            ]
+            for (method, route), histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram):
+                    cumulative += count
+                    labels = prometheus_labels(method=method, route=route, le=bound)
+                    lines.append(f"cafe_http_request_duration_seconds_bucket{labels} {cumulative}")
+                labels = prometheus_labels(method=method, route=route)
+                lines.append(f"cafe_http_request_duration_seconds_sum{labels} {histogram[-1]:.6f}")
+                lines.append(f"cafe_http_request_duration_seconds_count{labels} {cumulative}")
+            for name, index, kind, help_text in (
+                ("cafe_sql_statements_total", 0, "counter", "SQL statements executed."),
+                ("cafe_sql_duration_seconds_total", 1, "counter", "Time spent executing SQL statements."),
+                ("cafe_sql_slow_statements_total", 2, "counter", "SQL statements slower than the slow-query threshold."),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for route, entry in sorted(self.sql.items()):
+                    value = f"{entry[index]:.6f}" if index == 1 else entry[index]
+                    lines.append(f"{name}{prometheus_labels(route=route)} {value}")
+            lines += [
+                "# HELP cafe_sql_slow_query_seconds Most recent slow SQL statements.",
+                "# TYPE cafe_sql_slow_query_seconds gauge",
+            ]
+            for route, statement, seconds in self.slow_queries:
+                lines.append(f"cafe_sql_slow_query_seconds{prometheus_labels(route=route, statement=statement)} {seconds:.6f}")
+            if self.shed:
+                lines += [
+                    "# HELP cafe_pool_shed_requests_total Requests answered 503 because the worker pool was saturated.",
+                    "# TYPE cafe_pool_shed_requests_total counter",
+                ]
+                for priority, count in sorted(self.shed.items()):
+                    lines.append(f"cafe_pool_shed_requests_total{prometheus_labels(priority=PRIORITY_NAMES[priority])} {count}")
+            if self.idempotency:
+                lines += [
+                    "# HELP cafe_idempotent_requests_total Checkouts answered from an earlier request with the same Idempotency-Key.",
+                    "# TYPE cafe_idempotent_requests_total counter",
+                ]
+                for outcome, count in sorted(self.idempotency.items()):
+                    lines.append(f"cafe_idempotent_requests_total{prometheus_labels(outcome=outcome)} {count}")
+        lines += [
+            "# HELP cafe_http_requests_in_flight Requests currently being handled.",
+            "# TYPE cafe_http_requests_in_flight gauge",
+            f"cafe_http_requests_in_flight {len(self.active)}",
+            "# HELP cafe_db_pool_idle_connections Idle pooled SQLite connections.",
+            "# TYPE cafe_db_pool_idle_connections gauge",
+            f"cafe_db_pool_idle_connections {len(_pool)}",
+            "# HELP cafe_data_version Catalog and stock data version.",
+            "# TYPE cafe_data_version gauge",
+            f"cafe_data_version {data_version()}",
+            "# HELP cafe_event_subscribers Connected /api/events clients.",
+            "# TYPE cafe_event_subscribers gauge",
+            f"cafe_event_subscribers {len(broker.subscribers)}",
+            "# HELP cafe_event_dropped_subscribers_total Event clients dropped for falling behind.",
+            "# TYPE cafe_event_dropped_subscribers_total counter",
+            f"cafe_event_dropped_subscribers_total {broker.dropped}",
+        ]
+        if request_queue is not None:
+            lines += [
+                "# HELP cafe_pool_queued_requests Requests waiting for a pool worker.",
+                "# TYPE cafe_pool_queued_requests gauge",
+            ]
+            for priority, depth in enumerate(request_queue.depths()):
+                lines.append(f"cafe_pool_queued_requests{prometheus_labels(priority=PRIORITY_NAMES[priority])} {depth}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class SamplingProfiler:
+    """Samples the stacks of threads that are handling a request."""
+
+    def __init__(self, interval=PROFILER_INTERVAL, max_stacks=5000):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.stacks = {}
+        self.samples = 0
+        self.lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        if interval:
+            self.interval = interval
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def reset(self):
+        with self.lock:
+            self.stacks = {}
+            self.samples = 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, route in list(metrics.active.items()):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                key = route + ";" + ";".join(reversed(stack))
+                with self.lock:
+                    self.samples += 1
+                    if key in self.stacks or len(self.stacks) < self.max_stacks:
+                        self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def folded(self):
+        with self.lock:
+            items = sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+
+profiler = SamplingProfiler()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    fields_for = None
+    fields = ()
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.observe_sql(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.observe_sql(sql, time.perf_counter() - started)
+
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            metrics.observe_sql(sql_script, time.perf_counter() - started)
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connection that goes back to the pool on close() instead of closing."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute builds a plain Cursor without calling cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    # Events queued during a transaction reach subscribers only once it has committed
+    def commit(self):
+        super().commit()
+        if self.pending_events:
+            events, self.pending_events = self.pending_events, []
+            broker.publish(events)
+
+    def rollback(self):
+        super().rollback()
+        self.pending_events = []
+
+    def close(self):
+        _release_connection(self)
+
+    def dispose(self):
+        super().close()
+
+
+_pool = []
+_pool_lock = threading.Lock()
+
+
+def archive_path():
+    return ARCHIVE_DB_PATH or os.path.splitext(DB_PATH)[0] + "-archive.sqlite"
+
+
+ORDER_TIERS = ('main', 'archive')
+ORDER_TABLE_COLUMNS = "order_id, employee_id, order_date, total_amount, payment_method, status"
+ORDER_DETAIL_COLUMNS = "detail_id, order_id, product_id, quantity, price_at_sale"
+# An archive copy only counts once its hot row is gone; see archive_orders
+ARCHIVED_ONLY = "NOT EXISTS (SELECT 1 FROM main.orders h WHERE h.order_id = {alias}.order_id)"
+
+
+def _connect():
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=DB_BUSY_TIMEOUT,
+        check_same_thread=False,
+        factory=PooledConnection,
+    )
+    conn.db_path = DB_PATH
+    conn.pending_events = []
+    conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT * 1000)};")
+    conn.execute(f"PRAGMA journal_mode = {DB_JOURNAL_MODE};")
+    conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS};")
+    conn.execute(f"PRAGMA cache_size = {DB_CACHE_SIZE};")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE};")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    # Cold orders live in a separate file; the hot file keeps the page cache to itself
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path(),))
+    conn.execute(f"PRAGMA archive.journal_mode = {DB_JOURNAL_MODE};")
+    conn.execute(f"PRAGMA archive.synchronous = {DB_SYNCHRONOUS};")
+    conn.execute(f"PRAGMA archive.cache_size = {ARCHIVE_CACHE_SIZE};")
+    conn.execute(
+        f"CREATE TEMP VIEW all_orders AS SELECT {ORDER_TABLE_COLUMNS} FROM main.orders "
+        f"UNION ALL SELECT {ORDER_TABLE_COLUMNS} FROM archive.orders a WHERE {ARCHIVED_ONLY.format(alias='a')}"
+    )
+    conn.execute(
+        f"CREATE TEMP VIEW all_order_details AS SELECT {ORDER_DETAIL_COLUMNS} FROM main.order_details "
+        f"UNION ALL SELECT {ORDER_DETAIL_COLUMNS} FROM archive.order_details a WHERE {ARCHIVED_ONLY.format(alias='a')}"
+    )
+    return conn
+
+
+def _release_connection(conn):
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = dict_factory
+        conn.set_trace_callback(None)
+        conn.pending_events = []
+    except sqlite3.Error:
+        conn.dispose()
+        return
+    with _pool_lock:
+        if conn.db_path == DB_PATH and len(_pool) < DB_POOL_SIZE:
+            _pool.append(conn)
+            return
+    conn.dispose()
 
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = None
+    with _pool_lock:
+        while _pool:
+            candidate = _pool.pop()
+            if candidate.db_path == DB_PATH:
+                conn = candidate
+                break
+            candidate.dispose()
+    if conn is None:
+        conn = _connect()
     conn.row_factory = dict_factory
-    conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
 
+def close_db_pool():
+    with _pool_lock:
+        idle = list(_pool)
+        _pool.clear()
+    for conn in idle:
+        conn.dispose()
+
+
+BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS employees (
+    employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL CHECK(role IN ('Barista','Admin')),
+    phone TEXT,
+    password_hash TEXT NOT NULL,
+    is_active INTEGER DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS ingredients (
+    ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    current_stock REAL DEFAULT 0.0,
+    unit TEXT NOT NULL,
+    warning_threshold REAL DEFAULT 0.0
+);
+CREATE TABLE IF NOT EXISTS products (
+    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    price REAL NOT NULL,
+    is_active INTEGER DEFAULT 1,
+    FOREIGN KEY(category_id) REFERENCES categories(category_id) ON DELETE RESTRICT
+);
+CREATE TABLE IF NOT EXISTS recipes (
+    recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INTEGER NOT NULL,
+    ingredient_id INTEGER NOT NULL,
+    quantity_required REAL NOT NULL,
+    FOREIGN KEY(product_id) REFERENCES products(product_id) ON DELETE CASCADE,
+    FOREIGN KEY(ingredient_id) REFERENCES ingredients(ingredient_id) ON DELETE RESTRICT
+);
+CREATE TABLE IF NOT EXISTS supplies (
+    supply_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ingredient_id INTEGER NOT NULL,
+    quantity_added REAL NOT NULL,
+    cost REAL,
+    supply_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(ingredient_id) REFERENCES ingredients(ingredient_id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_id INTEGER NOT NULL,
+    order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    total_amount REAL NOT NULL,
+    payment_method TEXT DEFAULT 'Card',
+    status TEXT DEFAULT 'Paid',
+    FOREIGN KEY(employee_id) REFERENCES employees(employee_id) ON DELETE RESTRICT
+);
+CREATE TABLE IF NOT EXISTS order_details (
+    detail_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER DEFAULT 1,
+    price_at_sale REAL NOT NULL,
+    FOREIGN KEY(order_id) REFERENCES orders(order_id) ON DELETE CASCADE,
+    FOREIGN KEY(product_id) REFERENCES products(product_id) ON DELETE RESTRICT
+);
+"""
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales_rollup (
+    granularity TEXT NOT NULL CHECK(granularity IN ('hour','day')),
+    bucket TEXT NOT NULL,
+    payment_method TEXT NOT NULL,
+    employee_id INTEGER NOT NULL,
+    order_count INTEGER NOT NULL DEFAULT 0,
+    total_amount REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, bucket, payment_method, employee_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS product_sales_rollup (
+    granularity TEXT NOT NULL CHECK(granularity IN ('hour','day')),
+    bucket TEXT NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, bucket, product_id)
+) WITHOUT ROWID;
+"""
+
+ORDER_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(order_date, order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_employee_date ON orders(employee_id, order_date, order_id);
+CREATE INDEX IF NOT EXISTS idx_order_details_order ON order_details(order_id);
+"""
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive.orders (
+    order_id INTEGER PRIMARY KEY,
+    employee_id INTEGER NOT NULL,
+    order_date TIMESTAMP,
+    total_amount REAL NOT NULL,
+    payment_method TEXT,
+    status TEXT
+);
+CREATE TABLE IF NOT EXISTS archive.order_details (
+    detail_id INTEGER PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER,
+    price_at_sale REAL NOT NULL,
+    FOREIGN KEY(order_id) REFERENCES orders(order_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS archive.idx_orders_date ON orders(order_date, order_id);
+CREATE INDEX IF NOT EXISTS archive.idx_orders_employee_date ON orders(employee_id, order_date, order_id);
+CREATE INDEX IF NOT EXISTS archive.idx_order_details_order ON order_details(order_id);
+"""
+
+HOT_PATH_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_employees_phone ON employees(phone);
+CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);
+CREATE INDEX IF NOT EXISTS idx_recipes_product ON recipes(product_id);
+CREATE INDEX IF NOT EXISTS idx_recipes_ingredient ON recipes(ingredient_id);
+CREATE INDEX IF NOT EXISTS idx_order_details_product ON order_details(product_id);
+CREATE INDEX IF NOT EXISTS idx_supplies_ingredient ON supplies(ingredient_id);
+"""
+
+IDEMPOTENCY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    employee_id INTEGER NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    order_id INTEGER NOT NULL,
+    total_amount REAL NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (employee_id, idempotency_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys(created_at);
+"""
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stock_movements (
+    movement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ingredient_id INTEGER NOT NULL,
+    kind TEXT NOT NULL CHECK(kind IN ('sale','supply','correction','writeoff')),
+    quantity REAL NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    order_id INTEGER,
+    employee_id INTEGER,
+    note TEXT,
+    FOREIGN KEY(ingredient_id) REFERENCES ingredients(ingredient_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_stock_movements_ingredient ON stock_movements(ingredient_id);
+CREATE TABLE IF NOT EXISTS stock_snapshots (
+    ingredient_id INTEGER NOT NULL,
+    taken_at TIMESTAMP NOT NULL,
+    last_movement_id INTEGER NOT NULL,
+    stock REAL NOT NULL,
+    sold REAL NOT NULL DEFAULT 0,
+    written_off REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (ingredient_id, taken_at)
+) WITHOUT ROWID;
+"""
+
+ROLLUP_BUCKETS = (
+    ('hour', "strftime('%Y-%m-%d %H:00:00', o.order_date)", '%Y-%m-%d %H:00:00'),
+    ('day', "date(o.order_date)", '%Y-%m-%d'),
+)
+
+
+def _sales_rollup_statements(condition, orders='orders', details='order_details'):
+    orders_sql = " UNION ALL ".join(
+        f"SELECT '{granularity}', {bucket}, COALESCE(o.payment_method, ''), o.employee_id, COUNT(*), SUM(o.total_amount) "
+        f"FROM {orders} o WHERE {condition} GROUP BY 2, 3, 4"
+        for granularity, bucket, _ in ROLLUP_BUCKETS
+    )
+    products_sql = " UNION ALL ".join(
+        f"SELECT '{granularity}', {bucket}, d.product_id, SUM(d.quantity), SUM(d.quantity * d.price_at_sale) "
+        f"FROM {details} d JOIN {orders} o ON o.order_id = d.order_id WHERE {condition} GROUP BY 2, 3"
+        for granularity, bucket, _ in ROLLUP_BUCKETS
+    )
+    return (
+        "INSERT INTO sales_rollup (granularity, bucket, payment_method, employee_id, order_count, total_amount) "
+        + orders_sql
+        + " ON CONFLICT (granularity, bucket, payment_method, employee_id) DO UPDATE SET "
+        "order_count = order_count + excluded.order_count, total_amount = total_amount + excluded.total_amount",
+        "INSERT INTO product_sales_rollup (granularity, bucket, product_id, quantity, revenue) "
+        + products_sql
+        + " ON CONFLICT (granularity, bucket, product_id) DO UPDATE SET "
+        "quantity = quantity + excluded.quantity, revenue = revenue + excluded.revenue",
+    )
+
+
+def record_sales_rollup(conn, order_ids):
+    placeholders = ",".join("?" for _ in order_ids)
+    params = list(order_ids) * len(ROLLUP_BUCKETS)
+    for statement in _sales_rollup_statements(f"o.order_id IN ({placeholders})"):
+        conn.execute(statement, params)
+
+
+def rebuild_sales_rollups(conn):
+    conn.execute("DELETE FROM sales_rollup")
+    conn.execute("DELETE FROM product_sales_rollup")
+    for statement in _sales_rollup_statements("1", 'all_orders', 'all_order_details'):
+        conn.execute(statement)
+    conn.commit()
+
+
+def ensure_rollups(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sales_rollup'"
+    ).fetchone()
+    conn.executescript(ROLLUP_SCHEMA)
+    if not exists:
+        rebuild_sales_rollups(conn)
+
+
+def ensure_ledger(conn):
+    conn.executescript(LEDGER_SCHEMA)
+    # Ingredients without a snapshot (existing databases, seed data) get their baseline here
+    take_stock_snapshot(conn)
+
+
+# Each step runs once, in order; PRAGMA user_version records how many have been applied.
+# Steps must stay safe to re-run: databases created before versioning start at 0 and replay them all.
+MIGRATIONS = (
+    BASE_SCHEMA,
+    ensure_rollups,
+    ORDER_INDEXES,
+    ensure_ledger,
+    IDEMPOTENCY_SCHEMA,
+    HOT_PATH_INDEXES,
+)
+ARCHIVE_MIGRATIONS = (
+    ARCHIVE_SCHEMA,
+)
+
+
+def migrate(conn, migrations, schema='main'):
+    """Apply the migrations `schema` has not seen yet and return the version it started at."""
+    version = conn.execute(f"PRAGMA {schema}.user_version").fetchone()['user_version']
+    if version > len(migrations):
+        raise RuntimeError(f"Schema {schema} is at version {version}, newer than this build ({len(migrations)})")
+    for target in range(version + 1, len(migrations) + 1):
+        step = migrations[target - 1]
+        if callable(step):
+            # Callables commit their own work; if we stop before the bump they simply run again
+            step(conn)
+            conn.execute(f"PRAGMA {schema}.user_version = {target}")
+        else:
+            conn.executescript(f"BEGIN IMMEDIATE;\n{step}\nPRAGMA {schema}.user_version = {target};\nCOMMIT;")
+    return version
+
+
 def ensure_db():
-    if os.path.exists(DB_PATH):
-        return
     conn = get_db()
-    cur = conn.cursor()
-    cur.executescript(
-        """
-        CREATE TABLE categories (
-            category_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL
-        );
-        CREATE TABLE employees (
-            employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('Barista','Admin')),
-            phone TEXT,
-            password_hash TEXT NOT NULL,
-            is_active INTEGER DEFAULT 1
-        );
-        CREATE TABLE ingredients (
-            ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            current_stock REAL DEFAULT 0.0,
-            unit TEXT NOT NULL,
-            warning_threshold REAL DEFAULT 0.0
-        );
-        CREATE TABLE products (
-            product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            category_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            description TEXT,
-            price REAL NOT NULL,
-            is_active INTEGER DEFAULT 1,
-            FOREIGN KEY(category_id) REFERENCES categories(category_id) ON DELETE RESTRICT
-        );
-        CREATE TABLE recipes (
-            recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            product_id INTEGER NOT NULL,
-            ingredient_id INTEGER NOT NULL,
-            quantity_required REAL NOT NULL,
-            FOREIGN KEY(product_id) REFERENCES products(product_id) ON DELETE CASCADE,
-            FOREIGN KEY(ingredient_id) REFERENCES ingredients(ingredient_id) ON DELETE RESTRICT
-        );
-        CREATE TABLE supplies (
-            supply_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ingredient_id INTEGER NOT NULL,
-            quantity_added REAL NOT NULL,
-            cost REAL,
-            supply_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(ingredient_id) REFERENCES ingredients(ingredient_id) ON DELETE CASCADE
-        );
-        CREATE TABLE orders (
-            order_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            total_amount REAL NOT NULL,
-            payment_method TEXT DEFAULT 'Card',
-            status TEXT DEFAULT 'Paid',
-            FOREIGN KEY(employee_id) REFERENCES employees(employee_id) ON DELETE RESTRICT
-        );
-        CREATE TABLE order_details (
-            detail_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER NOT NULL,
-            product_id INTEGER NOT NULL,
-            quantity INTEGER DEFAULT 1,
-            price_at_sale REAL NOT NULL,
-            FOREIGN KEY(order_id) REFERENCES orders(order_id) ON DELETE CASCADE,
-            FOREIGN KEY(product_id) REFERENCES products(product_id) ON DELETE RESTRICT
-        );
-        """
-    )
+    try:
+        # Rollup rebuilds read the all_orders view, so the archive tables must exist first
+        migrate(conn, ARCHIVE_MIGRATIONS, 'archive')
+        fresh = migrate(conn, MIGRATIONS) == 0 and not conn.execute("SELECT 1 FROM employees LIMIT 1").fetchone()
+        if fresh and SEED_DEMO_DATA:
+            seed_db(conn)
+        elif fresh:
+            print("Database created without demo data; add a first admin with --create-admin PHONE", file=sys.stderr)
+    finally:
+        conn.close()
+
+
+def seed_db(conn):
+    passwords = ("admin123", "barista123", "barista123")
+    # PBKDF2 releases the GIL, so the seed hashes cost one hash of wall time instead of three
+    with ThreadPoolExecutor(max_workers=len(passwords)) as pool:
+        hashes = list(pool.map(lambda password: hash_password(password, _pbkdf2), passwords))
 
     def seed(table, rows):
         placeholders = ",".join(["?" for _ in rows[0]])
-        cur.executemany(
+        conn.executemany(
             f"INSERT INTO {table} ({','.join(rows[0].keys())}) VALUES ({placeholders})",
             [tuple(r.values()) for r in rows],
         )
@@ -138,9 +805,9 @@ def ensure_db():
     seed(
         "employees",
         [
-            {"name": "Олена Адмін", "role": "Admin", "phone": "+380991234567", "password_hash": hash_password("admin123")},
-            {"name": "Іван Бариста", "role": "Barista", "phone": "+380997654321", "password_hash": hash_password("barista123")},
-            {"name": "Петро Стажер", "role": "Barista", "phone": "+380630000000", "password_hash": hash_password("barista123")},
+            {"name": "Олена Адмін", "role": "Admin", "phone": "+380991234567", "password_hash": hashes[0]},
+            {"name": "Іван Бариста", "role": "Barista", "phone": "+380997654321", "password_hash": hashes[1]},
+            {"name": "Петро Стажер", "role": "Barista", "phone": "+380630000000", "password_hash": hashes[2]},
         ],
     )
 
@@ -212,7 +879,8 @@ def ensure_db():
     )
 
     conn.commit()
-    conn.close()
+    rebuild_sales_rollups(conn)
+    take_stock_snapshot(conn)
 
 
 def sign_token(payload: dict) -> str:
@@ -236,362 +904,3213 @@ def verify_token(token: str):
         if not hmac.compare_digest(expected, sig_b64.encode()):
             return None
         payload_json = base64.urlsafe_b64decode(payload_b64 + '==').decode()
-        return json.loads(payload_json)
+        payload = json.loads(payload_json)
+        if not isinstance(payload.get('exp'), (int, float)) or payload['exp'] <= time.time():
+            return None
+        return payload
     except Exception:
         return None
 
 
+class TokenCache:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            payload = self._entries.get(token)
+            if payload is None:
+                return None
+            if payload['exp'] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return payload
+
+    def put(self, token, payload):
+        with self._lock:
+            self._entries[token] = payload
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
+def read_body(handler):
+    if handler.request_body is None:
+        length = int(handler.headers.get('Content-Length', 0))
+        handler.request_body = handler.rfile.read(length) if length else b''
+    return handler.request_body
+
+
 def read_json(handler):
-    length = int(handler.headers.get('Content-Length', 0))
-    body = handler.rfile.read(length) if length else b''
+    body = read_body(handler)
     if not body:
         return {}
     return json.loads(body.decode())
 
 
-def authenticate(handler):
+def read_rows(handler):
+    content_type = handler.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    body = read_body(handler)
+    if content_type == 'text/csv':
+        return list(csv.DictReader(io.StringIO(body.decode('utf-8-sig'))))
+    data = json.loads(body.decode()) if body else []
+    if isinstance(data, dict):
+        data = data.get('items', [data])
+    if not isinstance(data, list):
+        raise ValueError("Очікується масив рядків")
+    return data
+
+
+def authenticate(handler, query_token=None):
     auth_header = handler.headers.get('Authorization', '')
-    if not auth_header.startswith('Bearer '):
+    if auth_header.startswith('Bearer '):
+        token = auth_header.split(' ', 1)[1]
+    elif query_token:
+        token = query_token
+    else:
         return None
-    token = auth_header.split(' ', 1)[1]
-    return verify_token(token)
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = verify_token(token)
+        if payload is not None:
+            token_cache.put(token, payload)
+    return payload
+
+
+def send_json(handler, data, status=HTTPStatus.OK, headers=None):
+    send_json_bytes(handler, dump_json(data), status, headers)
 
 
-def send_json(handler, data, status=HTTPStatus.OK):
-    response = json.dumps(data).encode()
+def send_json_bytes(handler, response, status=HTTPStatus.OK, headers=None):
+    read_body(handler)
     handler.send_response(status)
-    handler.send_header('Content-Type', 'application/json')
+    handler.send_header('Content-Type', 'application/json; charset=utf-8')
     handler.send_header('Content-Length', str(len(response)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
     handler.send_header('Access-Control-Allow-Origin', '*')
-    handler.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+    handler.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization, Idempotency-Key')
     handler.send_header('Access-Control-Allow-Methods', 'GET,POST,PUT,OPTIONS')
     handler.end_headers()
     handler.wfile.write(response)
 
 
+def send_ndjson(handler, rows):
+    read_body(handler)
+    chunked = handler.request_version != 'HTTP/1.0'
+    handler.send_response(HTTPStatus.OK)
+    handler.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+    handler.send_header('Access-Control-Allow-Origin', '*')
+    if chunked:
+        handler.send_header('Transfer-Encoding', 'chunked')
+    else:
+        handler.send_header('Connection', 'close')
+        handler.close_connection = True
+    handler.end_headers()
+
+    def flush(parts):
+        data = b''.join(parts)
+        if chunked:
+            data = f"{len(data):x}\r\n".encode() + data + b"\r\n"
+        handler.wfile.write(data)
+
+    parts = []
+    buffered = 0
+    try:
+        for row in rows:
+            line = dump_json(row) + b'\n'
+            parts.append(line)
+            buffered += len(line)
+            if buffered >= 65536:
+                flush(parts)
+                parts = []
+                buffered = 0
+        if parts:
+            flush(parts)
+        if chunked:
+            handler.wfile.write(b"0\r\n\r\n")
+    except Exception:
+        handler.close_connection = True
+        raise
+
+
+def send_text(handler, text, content_type='text/plain; charset=utf-8', status=HTTPStatus.OK):
+    response = text.encode()
+    read_body(handler)
+    handler.send_response(status)
+    handler.send_header('Content-Type', content_type)
+    handler.send_header('Content-Length', str(len(response)))
+    handler.send_header('Access-Control-Allow-Origin', '*')
+    handler.end_headers()
+    handler.wfile.write(response)
+
+
+def send_not_modified(handler, headers):
+    read_body(handler)
+    handler.send_response(HTTPStatus.NOT_MODIFIED)
+    for name, value in headers.items():
+        handler.send_header(name, value)
+    handler.send_header('Access-Control-Allow-Origin', '*')
+    handler.end_headers()
+
+
+EMPLOYEE_BY_PHONE_SQL = "SELECT * FROM employees WHERE phone=? AND is_active=1"
+
+
 def handle_login(body):
     phone = body.get('phone')
     password = body.get('password')
     if not phone or not password:
         return None, "Phone and password required"
     conn = get_db()
-    user = conn.execute("SELECT * FROM employees WHERE phone=? AND is_active=1", (phone,)).fetchone()
+    user = conn.execute(EMPLOYEE_BY_PHONE_SQL, (phone,)).fetchone()
     conn.close()
     if not user:
         return None, "User not found"
-    stored = base64.b64decode(user['password_hash'].encode())
-    salt, stored_dk = stored[:16], stored[16:]
-    test_dk = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 100000)
-    if not hmac.compare_digest(stored_dk, test_dk):
+    if not check_password(password, user['password_hash']):
         return None, "Invalid credentials"
-    token = sign_token({"employee_id": user['employee_id'], "role": user['role'], "name": user['name']})
+    token = sign_token({
+        "employee_id": user['employee_id'],
+        "role": user['role'],
+        "name": user['name'],
+        "exp": int(time.time()) + TOKEN_TTL,
+    })
     return {"token": token, "user": {"name": user['name'], "role": user['role']}}, None
 
 
-def get_products(category_id=None):
-    conn = get_db()
-    query = "SELECT * FROM products WHERE is_active=1"
-    params = []
+BOOT_ID = base64.urlsafe_b64encode(os.urandom(6)).decode()
+_data_version = 0
+_data_version_lock = threading.Lock()
+_data_version_file = None
+_data_version_memory = None
+_local_bumps = 0
+
+
+def share_data_version():
+    """Move the version counter into a shared mapping before forking workers.
+
+    A POSIX record lock on the backing file serialises bumps across processes and is
+    released by the kernel if a worker dies holding it.
+    """
+    global _data_version_file, _data_version_memory
+    if fcntl is None:
+        raise RuntimeError("shared data version needs POSIX file locks")
+    _data_version_file = tempfile.TemporaryFile()
+    _data_version_file.write(struct.pack('q', _data_version))
+    _data_version_file.flush()
+    _data_version_memory = mmap.mmap(_data_version_file.fileno(), 8)
+
+
+def data_version():
+    if _data_version_memory is not None:
+        return struct.unpack_from('q', _data_version_memory)[0]
+    return _data_version
+
+
+def bump_data_version():
+    global _data_version, _local_bumps
+    with _data_version_lock:
+        _local_bumps += 1
+        if _data_version_memory is None:
+            _data_version += 1
+            return _data_version
+        fcntl.lockf(_data_version_file, fcntl.LOCK_EX)
+        try:
+            value = struct.unpack_from('q', _data_version_memory)[0] + 1
+            struct.pack_into('q', _data_version_memory, 0, value)
+        finally:
+            fcntl.lockf(_data_version_file, fcntl.LOCK_UN)
+        return value
+
+
+class Subscription:
+    def __init__(self, size):
+        self.queue = queue.Queue(size)
+        self.dropped = False
+
+
+class EventBroker:
+    """Fans committed stock and catalog changes out to /api/events clients.
+
+    Every client has a bounded queue; one that falls a full queue behind is dropped
+    and has to reconnect and refetch, so a stalled terminal never holds up writers.
+    """
+
+    def __init__(self, queue_size=EVENT_QUEUE_SIZE, max_clients=EVENT_MAX_CLIENTS):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.last_id = 0
+        self.dropped = 0
+
+    def subscribe(self):
+        with self.lock:
+            if len(self.subscribers) >= self.max_clients:
+                return None
+            subscription = Subscription(self.queue_size)
+            self.subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, events):
+        with self.lock:
+            if not self.subscribers:
+                return
+            frames = []
+            for event, data in events:
+                self.last_id += 1
+                frames.append(f"id: {self.last_id}\nevent: {event}\ndata: ".encode() + dump_json(data) + b"\n\n")
+            for subscription in list(self.subscribers):
+                try:
+                    for frame in frames:
+                        subscription.queue.put_nowait(frame)
+                except queue.Full:
+                    subscription.dropped = True
+                    self.subscribers.discard(subscription)
+                    self.dropped += 1
+
+    def close_all(self):
+        with self.lock:
+            for subscription in self.subscribers:
+                subscription.dropped = True
+            self.subscribers.clear()
+
+
+broker = EventBroker()
+
+
+def queue_event(conn, event, data):
+    if broker.subscribers:
+        conn.pending_events.append((event, data))
+
+
+def stock_levels(conn, ingredient_ids):
+    if not ingredient_ids:
+        return {}
+    placeholders = ",".join("?" for _ in ingredient_ids)
+    return {
+        row['ingredient_id']: (row['current_stock'], row['warning_threshold'])
+        for row in conn.execute(
+            f"SELECT ingredient_id, current_stock, warning_threshold FROM ingredients WHERE ingredient_id IN ({placeholders})",
+            list(ingredient_ids),
+        )
+    }
+
+
+AFFECTED_PRODUCTS_SQL = (
+    "SELECT r.product_id, r.ingredient_id, r.quantity_required, i.current_stock FROM recipes r "
+    "JOIN ingredients i ON i.ingredient_id = r.ingredient_id "
+    "JOIN products p ON p.product_id = r.product_id WHERE p.is_active=1 AND r.product_id IN "
+    "(SELECT product_id FROM recipes WHERE ingredient_id IN ({placeholders}))"
+)
+
+
+def queue_stock_events(conn, deltas=None, previous=None):
+    """Queue stock, availability and low-stock events for ingredient changes already applied in conn.
+
+    Pass either the stock deltas that were applied, or the (stock, threshold) levels read
+    with stock_levels() before an absolute update.
+    """
+    ids = list(deltas or previous or ())
+    if not ids or not broker.subscribers:
+        return
+    placeholders = ",".join("?" for _ in ids)
+    was_stock = {}
+    stock = []
+    alerts = []
+    for row in conn.execute(
+        "SELECT ingredient_id, name, unit, current_stock, warning_threshold FROM ingredients "
+        f"WHERE ingredient_id IN ({placeholders})",
+        ids,
+    ):
+        ingredient_id = row['ingredient_id']
+        if previous is not None:
+            was_stock[ingredient_id], was_threshold = previous[ingredient_id]
+            delta = row['current_stock'] - was_stock[ingredient_id]
+        else:
+            delta = deltas[ingredient_id]
+            was_stock[ingredient_id] = row['current_stock'] - delta
+            was_threshold = row['warning_threshold']
+        is_low = row['current_stock'] <= row['warning_threshold']
+        stock.append({
+            'ingredient_id': ingredient_id,
+            'current_stock': row['current_stock'],
+            'delta': delta,
+            'low': is_low,
+        })
+        if is_low and was_stock[ingredient_id] > was_threshold:
+            alerts.append(row)
+    before = {}
+    after = {}
+    for row in conn.execute(AFFECTED_PRODUCTS_SQL.format(placeholders=placeholders), ids):
+        product_id = row['product_id']
+        now = int(row['current_stock'] // row['quantity_required'])
+        then = int(was_stock.get(row['ingredient_id'], row['current_stock']) // row['quantity_required'])
+        after[product_id] = min(after.get(product_id, now), now)
+        before[product_id] = min(before.get(product_id, then), then)
+    conn.pending_events.append(('stock', {'ingredients': stock}))
+    products = [
+        {'product_id': product_id, 'max_available': available}
+        for product_id, available in after.items()
+        if available != before[product_id]
+    ]
+    if products:
+        conn.pending_events.append(('availability', {'products': products}))
+    for alert in alerts:
+        conn.pending_events.append(('low_stock', alert))
+
+
+class VersionedCache:
+    def __init__(self):
+        self._version = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            if self._version != version:
+                return None
+            return self._entries.get(key)
+
+    def put(self, key, version, value):
+        with self._lock:
+            if self._version != version:
+                if self._version is not None and version < self._version:
+                    return
+                self._version = version
+                self._entries = {}
+            self._entries[key] = value
+
+
+catalog_cache = VersionedCache()
+
+
+def catalog_etag(version, key):
+    return f'"{BOOT_ID}-{version}-{key}"'
+
+
+def availability_query(category_id=None):
+    query = (
+        "SELECT r.product_id, r.quantity_required, i.current_stock FROM recipes r "
+        "JOIN ingredients i ON i.ingredient_id = r.ingredient_id "
+        "JOIN products p ON p.product_id = r.product_id WHERE p.is_active=1"
+    )
     if category_id:
-        query += " AND category_id=?"
-        params.append(category_id)
-    products = conn.execute(query, params).fetchall()
+        return query + " AND p.category_id=?", [category_id]
+    return query, []
+
+
+def product_availability(conn, category_id=None):
+    query, params = availability_query(category_id)
     availability = {}
-    for prod in products:
-        recipes = conn.execute(
-            "SELECT ingredient_id, quantity_required FROM recipes WHERE product_id=?",
-            (prod['product_id'],),
-        ).fetchall()
-        if not recipes:
-            availability[prod['product_id']] = None
-            continue
-        possible_counts = []
-        for r in recipes:
-            ingredient = conn.execute(
-                "SELECT current_stock FROM ingredients WHERE ingredient_id=?",
-                (r['ingredient_id'],),
-            ).fetchone()
-            possible_counts.append(int(ingredient['current_stock'] // r['quantity_required']))
-        availability[prod['product_id']] = min(possible_counts) if possible_counts else None
+    for row in conn.execute(query, params):
+        possible = int(row['current_stock'] // row['quantity_required'])
+        current = availability.get(row['product_id'])
+        if current is None or possible < current:
+            availability[row['product_id']] = possible
+    return availability
+
+
+def products_query(category_id=None):
+    if category_id:
+        return "SELECT * FROM products WHERE is_active=1 AND category_id=?", [category_id]
+    return "SELECT * FROM products WHERE is_active=1", []
+
+
+def get_products(category_id=None, columnar=False):
+    conn = get_db()
+    cursor = conn.execute(*products_query(category_id))
+    products = fetch_columnar(cursor, ('max_available',)) if columnar else cursor.fetchall()
+    availability = product_availability(conn, category_id)
     conn.close()
+    if columnar:
+        key = products['columns'].index('product_id')
+        products['rows'] = [row + (availability.get(row[key]),) for row in products['rows']]
+        return products
     for prod in products:
         prod['max_available'] = availability.get(prod['product_id'])
     return products
 
 
-def adjust_stock(conn, product_id, quantity):
-    recipes = conn.execute(
-        "SELECT ingredient_id, quantity_required FROM recipes WHERE product_id=?",
-        (product_id,),
-    ).fetchall()
-    for recipe in recipes:
-        needed = recipe['quantity_required'] * quantity
-        current = conn.execute(
-            "SELECT current_stock FROM ingredients WHERE ingredient_id=?",
-            (recipe['ingredient_id'],),
-        ).fetchone()
-        if current['current_stock'] < needed:
-            raise ValueError("Недостатньо інгредієнтів")
-    for recipe in recipes:
-        needed = recipe['quantity_required'] * quantity
-        conn.execute(
-            "UPDATE ingredients SET current_stock=current_stock-? WHERE ingredient_id=?",
-            (needed, recipe['ingredient_id']),
-        )
+class StockShortageError(ValueError):
+    def __init__(self, shortages):
+        super().__init__("Недостатньо інгредієнтів")
+        self.shortages = shortages
 
 
-class AppHandler(SimpleHTTPRequestHandler):
-    def translate_path(self, path):
-        # Serve frontend files for non-api routes
-        if path.startswith('/api'):
-            return super().translate_path(path)
-        if path == '/':
-            path = '/index.html'
-        return os.path.join(FRONTEND_DIR, path.lstrip('/'))
+RECIPE_DEMAND_SQL = "SELECT product_id, ingredient_id, quantity_required FROM recipes WHERE product_id IN ({placeholders})"
 
-    def do_OPTIONS(self):
-        self.send_response(HTTPStatus.NO_CONTENT)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        self.send_header('Access-Control-Allow-Methods', 'GET,POST,PUT,OPTIONS')
-        self.end_headers()
 
-    def do_POST(self):
-        if self.path.startswith('/api/auth/login'):
-            body = read_json(self)
-            data, error = handle_login(body)
-            if error:
-                send_json(self, {"error": error}, HTTPStatus.UNAUTHORIZED)
-            else:
-                send_json(self, data)
-            return
-        user = authenticate(self)
-        if not user:
-            send_json(self, {"error": "Unauthorized"}, HTTPStatus.UNAUTHORIZED)
-            return
-        if self.path == '/api/orders':
-            body = read_json(self)
-            items = body.get('items', [])
-            payment_method = body.get('payment_method', 'Card')
-            if not items:
-                send_json(self, {"error": "Порожнє замовлення"}, HTTPStatus.BAD_REQUEST)
-                return
-            conn = get_db()
-            try:
-                total = 0.0
-                for item in items:
-                    product = conn.execute(
-                        "SELECT price FROM products WHERE product_id=?",
-                        (item['product_id'],),
-                    ).fetchone()
-                    total += product['price'] * item.get('quantity', 1)
-                for item in items:
-                    adjust_stock(conn, item['product_id'], item.get('quantity', 1))
-                cur = conn.cursor()
-                cur.execute(
-                    "INSERT INTO orders (employee_id, total_amount, payment_method, status) VALUES (?,?,?,?)",
-                    (user['employee_id'], total, payment_method, 'Paid'),
-                )
-                order_id = cur.lastrowid
-                for item in items:
-                    product = conn.execute(
-                        "SELECT price FROM products WHERE product_id=?",
-                        (item['product_id'],),
-                    ).fetchone()
-                    cur.execute(
-                        "INSERT INTO order_details (order_id, product_id, quantity, price_at_sale) VALUES (?,?,?,?)",
-                        (order_id, item['product_id'], item.get('quantity', 1), product['price']),
-                    )
-                conn.commit()
-                send_json(self, {"message": "Замовлення оформлено", "order_id": order_id, "total": total})
-            except ValueError as exc:
-                conn.rollback()
-                send_json(self, {"error": str(exc)}, HTTPStatus.BAD_REQUEST)
-            finally:
-                conn.close()
-            return
-        if self.path == '/api/products':
-            if user['role'] != 'Admin':
-                send_json(self, {"error": "Доступ заборонено"}, HTTPStatus.FORBIDDEN)
-                return
-            body = read_json(self)
-            conn = get_db()
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO products (category_id, name, description, price, is_active) VALUES (?,?,?,?,1)",
-                (
-                    body.get('category_id'),
-                    body.get('name'),
-                    body.get('description', ''),
-                    body.get('price'),
-                ),
-            )
-            conn.commit()
-            new_id = cur.lastrowid
-            conn.close()
-            send_json(self, {"product_id": new_id})
-            return
-        if self.path == '/api/employees':
-            if user['role'] != 'Admin':
-                send_json(self, {"error": "Доступ заборонено"}, HTTPStatus.FORBIDDEN)
-                return
-            body = read_json(self)
-            required_fields = ['name', 'phone', 'password']
-            if not all(body.get(f) for f in required_fields):
-                send_json(self, {"error": "Вкажіть ім'я, телефон та пароль"}, HTTPStatus.BAD_REQUEST)
-                return
-            role = body.get('role', 'Barista')
-            if role not in ('Admin', 'Barista'):
-                send_json(self, {"error": "Невідома роль"}, HTTPStatus.BAD_REQUEST)
-                return
-            conn = get_db()
-            try:
-                cur = conn.cursor()
-                cur.execute(
-                    "INSERT INTO employees (name, role, phone, password_hash, is_active) VALUES (?,?,?,?,1)",
-                    (
-                        body['name'],
-                        role,
-                        body['phone'],
-                        hash_password(body['password']),
-                    ),
-                )
-                conn.commit()
-                employee_id = cur.lastrowid
-            except sqlite3.IntegrityError:
-                conn.rollback()
-                send_json(self, {"error": "Телефон уже використовується"}, HTTPStatus.BAD_REQUEST)
-                return
-            finally:
-                conn.close()
-            send_json(self, {"employee_id": employee_id, "role": role})
-            return
-        if self.path == '/api/ingredients':
-            if user['role'] != 'Admin':
-                send_json(self, {"error": "Доступ заборонено"}, HTTPStatus.FORBIDDEN)
+def ingredient_demand(conn, quantities):
+    if not quantities:
+        return {}
+    placeholders = ",".join("?" for _ in quantities)
+    demand = {}
+    for row in conn.execute(RECIPE_DEMAND_SQL.format(placeholders=placeholders), list(quantities)):
+        needed = row['quantity_required'] * quantities[row['product_id']]
+        demand[row['ingredient_id']] = demand.get(row['ingredient_id'], 0) + needed
+    return demand
+
+
+SHORTAGES_SQL = (
+    "SELECT i.ingredient_id, i.name, i.unit, i.current_stock AS available, d.column2 AS required "
+    "FROM (VALUES {rows}) AS d JOIN ingredients i ON i.ingredient_id = d.column1 "
+    "WHERE i.current_stock < d.column2 ORDER BY i.ingredient_id"
+)
+
+
+def deduct_ingredients(conn, demand):
+    """Deduct demand from stock, or raise StockShortageError listing every short ingredient.
+
+    Callers hold the write lock (BEGIN IMMEDIATE), so the levels checked here are the ones the
+    update sees; checking first keeps the shortage report from reading half-deducted stock.
+    """
+    if not demand:
+        return
+    rows = ",".join("(?,?)" for _ in demand)
+    params = [value for row in demand.items() for value in row]
+    shortages = conn.execute(SHORTAGES_SQL.format(rows=rows), params).fetchall()
+    if shortages:
+        raise StockShortageError(shortages)
+    conn.execute(
+        "UPDATE ingredients SET current_stock = current_stock - d.column2 "
+        f"FROM (VALUES {rows}) AS d WHERE ingredients.ingredient_id = d.column1",
+        params,
+    )
+    queue_stock_events(conn, {ingredient_id: -needed for ingredient_id, needed in demand.items()})
+
+
+def list_ingredients(columnar=False):
+    conn = get_db()
+    cursor = conn.execute("SELECT * FROM ingredients")
+    data = fetch_columnar(cursor) if columnar else cursor.fetchall()
+    conn.close()
+    return data
+
+
+ORDER_FILTERS = (
+    ('from', "o.order_date >= ?"),
+    ('to', "o.order_date < ?"),
+    ('employee_id', "o.employee_id = ?"),
+    ('status', "o.status = ?"),
+)
+ORDER_COLUMNS = "o.order_id, o.employee_id, o.order_date, o.total_amount, o.payment_method, o.status"
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Некоректний курсор")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("Некоректний курсор")
+    return values
+
+
+def order_filters(filters, cursor=None, tier='main'):
+    clauses = [ARCHIVED_ONLY.format(alias='o')] if tier == 'archive' else []
+    params = []
+    for name, clause in ORDER_FILTERS:
+        if filters.get(name) is not None:
+            clauses.append(clause)
+            params.append(filters[name])
+    if cursor:
+        order_date, order_id = decode_cursor(cursor)
+        clauses.append("(o.order_date, o.order_id) < (?, ?)")
+        params += [order_date, order_id]
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+ORDER_ITEMS_SQL = (
+    "SELECT order_id, product_id, quantity, price_at_sale FROM all_order_details "
+    "WHERE order_id IN ({placeholders}) ORDER BY detail_id"
+)
+
+
+def orders_page_query(tier, filters, cursor=None, limit=50):
+    where, params = order_filters(filters, cursor, tier)
+    return (
+        f"SELECT {ORDER_COLUMNS} FROM {tier}.orders o{where} ORDER BY o.order_date DESC, o.order_id DESC LIMIT ?",
+        params + [limit],
+    )
+
+
+def list_orders(conn, filters, cursor=None, limit=50):
+    # Archived orders are all older than hot ones, so a page reaches the archive only once the hot tier runs out
+    orders = []
+    for tier in ORDER_TIERS:
+        orders += conn.execute(*orders_page_query(tier, filters, cursor, limit + 1 - len(orders))).fetchall()
+        if len(orders) > limit:
+            break
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1]['order_date'], orders[-1]['order_id'])
+    if orders:
+        by_id = {order['order_id']: order for order in orders}
+        for order in orders:
+            order['items'] = []
+        placeholders = ",".join("?" for _ in by_id)
+        for detail in conn.execute(ORDER_ITEMS_SQL.format(placeholders=placeholders), list(by_id)):
+            by_id[detail.pop('order_id')]['items'].append(detail)
+    return {"orders": orders, "next_cursor": next_cursor}
+
+
+def iter_orders(conn, filters, cursor=None, limit=None):
+    remaining = limit
+    for tier in ORDER_TIERS:
+        for order in _iter_tier_orders(conn, tier, filters, cursor, remaining):
+            yield order
+            if remaining:
+                remaining -= 1
+                if not remaining:
+                    return
+
+
+def _iter_tier_orders(conn, tier, filters, cursor=None, limit=None):
+    where, params = order_filters(filters, cursor, tier)
+    if limit:
+        source = f"(SELECT * FROM {tier}.orders o{where} ORDER BY o.order_date DESC, o.order_id DESC LIMIT ?)"
+        params.append(limit)
+        where = ""
+    else:
+        source = f"{tier}.orders"
+    rows = conn.execute(
+        f"SELECT {ORDER_COLUMNS}, d.product_id, d.quantity, d.price_at_sale FROM {source} o "
+        f"LEFT JOIN {tier}.order_details d ON d.order_id = o.order_id{where} "
+        "ORDER BY o.order_date DESC, o.order_id DESC, d.detail_id",
+        params,
+    )
+    rows.row_factory = None
+    order = None
+    for row in rows:
+        if order is None or order['order_id'] != row[0]:
+            if order is not None:
+                yield order
+            order = {
+                'order_id': row[0],
+                'employee_id': row[1],
+                'order_date': row[2],
+                'total_amount': row[3],
+                'payment_method': row[4],
+                'status': row[5],
+                'items': [],
+            }
+        if row[6] is not None:
+            order['items'].append({'product_id': row[6], 'quantity': row[7], 'price_at_sale': row[8]})
+    if order is not None:
+        yield order
+
+
+def list_ingredients_page(conn, after=None, limit=100, columnar=False):
+    cursor = conn.execute(
+        "SELECT * FROM ingredients WHERE ingredient_id > ? ORDER BY ingredient_id LIMIT ?",
+        (after or 0, limit + 1),
+    )
+    if not columnar:
+        rows = cursor.fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]['ingredient_id']
+        return {"ingredients": rows, "next_cursor": next_cursor}
+    page = fetch_columnar(cursor)
+    page['next_cursor'] = None
+    if len(page['rows']) > limit:
+        page['rows'] = page['rows'][:limit]
+        page['next_cursor'] = page['rows'][-1][page['columns'].index('ingredient_id')]
+    return page
+
+
+def iter_ingredients(conn, after=None):
+    yield from conn.execute(
+        "SELECT * FROM ingredients WHERE ingredient_id > ? ORDER BY ingredient_id", (after or 0,)
+    )
+
+
+def page_size(query, default):
+    limit = int(query.get('limit', [default])[0])
+    if limit < 1:
+        raise ValueError("Некоректний ліміт")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+class BulkValidationError(ValueError):
+    def __init__(self, errors):
+        super().__init__("Помилки у рядках імпорту")
+        self.errors = errors
+
+
+def row_field(row, name, kind=float, required=False, minimum=None):
+    value = row.get(name)
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == '':
+        if required:
+            raise ValueError(f"Поле {name} обов'язкове")
+        return None
+    if kind is str:
+        return str(value)
+    if isinstance(value, bool):
+        raise ValueError(f"Некоректне значення {name}")
+    try:
+        value = kind(value.replace(',', '.') if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Некоректне значення {name}")
+    if kind is int and isinstance(row.get(name), float) and row[name] != value:
+        raise ValueError(f"Некоректне значення {name}")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"Поле {name} має бути не менше {minimum}")
+    return value
+
+
+def validate_rows(rows, validate):
+    valid = []
+    errors = []
+    for index, row in enumerate(rows, start=1):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("Рядок має бути об'єктом")
+            valid.append((index, validate(row)))
+        except ValueError as exc:
+            errors.append({"row": index, "error": str(exc)})
+    return valid, errors
+
+
+def existing_ids(conn, table, column, ids):
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return set()
+    placeholders = ",".join("?" for _ in ids)
+    return {
+        row[column]
+        for row in conn.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", list(ids))
+    }
+
+
+def inserted_ids(conn, table, column, previous_max):
+    return [
+        row[column]
+        for row in conn.execute(f"SELECT {column} FROM {table} WHERE {column} > ? ORDER BY {column}", (previous_max,))
+    ]
+
+
+def run_bulk(conn, apply):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = apply()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return result
+
+
+def _ingredient_row(row):
+    ingredient_id = row_field(row, 'ingredient_id', int)
+    return {
+        'ingredient_id': ingredient_id,
+        'name': row_field(row, 'name', str, required=ingredient_id is None),
+        'current_stock': row_field(row, 'current_stock', minimum=0),
+        'unit': row_field(row, 'unit', str),
+        'warning_threshold': row_field(row, 'warning_threshold', minimum=0),
+    }
+
+
+def bulk_upsert_ingredients(conn, rows):
+    valid, errors = validate_rows(rows, _ingredient_row)
+
+    def apply():
+        known = existing_ids(conn, 'ingredients', 'ingredient_id', [r['ingredient_id'] for _, r in valid])
+        for index, row in valid:
+            if row['ingredient_id'] is not None and row['ingredient_id'] not in known:
+                errors.append({"row": index, "error": "Інгредієнт не знайдено"})
+        if errors:
+            raise BulkValidationError(sorted(errors, key=lambda e: e['row']))
+        updates = [r for _, r in valid if r['ingredient_id'] is not None]
+        inserts = [r for _, r in valid if r['ingredient_id'] is None]
+        previous = stock_levels(conn, {r['ingredient_id'] for r in updates})
+        previous_max = conn.execute(
+            "SELECT COALESCE(MAX(ingredient_id), 0) AS max_id FROM ingredients"
+        ).fetchone()['max_id']
+        conn.executemany(
+            "INSERT INTO ingredients (name, current_stock, unit, warning_threshold) VALUES (?,?,?,?)",
+            [(r['name'], r['current_stock'] or 0, r['unit'] or '', r['warning_threshold'] or 0) for r in inserts],
+        )
+        conn.executemany(
+            "UPDATE ingredients SET name=COALESCE(?, name), current_stock=COALESCE(?, current_stock), "
+            "unit=COALESCE(?, unit), warning_threshold=COALESCE(?, warning_threshold) WHERE ingredient_id=?",
+            [(r['name'], r['current_stock'], r['unit'], r['warning_threshold'], r['ingredient_id']) for r in updates],
+        )
+        # Rows for the same ingredient apply in order, so the last absolute stock wins
+        corrections = {
+            r['ingredient_id']: r['current_stock'] - previous[r['ingredient_id']][0]
+            for r in updates if r['current_stock'] is not None
+        }
+        record_movements(conn, 'correction', corrections)
+        baseline_snapshots(conn, inserted_ids(conn, 'ingredients', 'ingredient_id', previous_max))
+        queue_event(conn, 'catalog', {'resource': 'ingredients', 'ids': None})
+        queue_stock_events(conn, previous=previous)
+        return {"inserted": len(inserts), "updated": len(updates)}
+
+    if not valid and not errors:
+        raise ValueError("Порожній імпорт")
+    return run_bulk(conn, apply)
+
+
+DELETE_RECIPES_SQL = "DELETE FROM recipes WHERE product_id=?"
+
+
+def _product_row(row):
+    product_id = row_field(row, 'product_id', int)
+    is_active = row.get('is_active')
+    if isinstance(is_active, str):
+        is_active = is_active.strip().lower() not in ('', '0', 'false', 'no', 'ні')
+    recipes = row.get('recipes')
+    if recipes is not None:
+        if not isinstance(recipes, list) or not all(isinstance(r, dict) for r in recipes):
+            raise ValueError("Поле recipes має бути масивом об'єктів")
+        recipes = [
+            (row_field(r, 'ingredient_id', int, required=True), row_field(r, 'quantity_required', required=True))
+            for r in recipes
+        ]
+        if any(quantity <= 0 for _, quantity in recipes):
+            raise ValueError("Кількість у рецепті має бути більше 0")
+    return {
+        'product_id': product_id,
+        'category_id': row_field(row, 'category_id', int, required=product_id is None),
+        'name': row_field(row, 'name', str, required=product_id is None),
+        'description': row_field(row, 'description', str),
+        'price': row_field(row, 'price', required=product_id is None, minimum=0),
+        'is_active': None if is_active is None else (1 if is_active else 0),
+        'recipes': recipes,
+    }
+
+
+def bulk_upsert_products(conn, rows):
+    valid, errors = validate_rows(rows, _product_row)
+
+    def apply():
+        known_products = existing_ids(conn, 'products', 'product_id', [r['product_id'] for _, r in valid])
+        known_categories = existing_ids(conn, 'categories', 'category_id', [r['category_id'] for _, r in valid])
+        known_ingredients = existing_ids(
+            conn, 'ingredients', 'ingredient_id',
+            [ingredient_id for _, r in valid for ingredient_id, _ in (r['recipes'] or [])],
+        )
+        for index, row in valid:
+            if row['product_id'] is not None and row['product_id'] not in known_products:
+                errors.append({"row": index, "error": "Продукт не знайдено"})
+            elif row['category_id'] is not None and row['category_id'] not in known_categories:
+                errors.append({"row": index, "error": "Категорію не знайдено"})
+            elif any(ingredient_id not in known_ingredients for ingredient_id, _ in (row['recipes'] or [])):
+                errors.append({"row": index, "error": "Інгредієнт не знайдено"})
+        if errors:
+            raise BulkValidationError(sorted(errors, key=lambda e: e['row']))
+        updates = [r for _, r in valid if r['product_id'] is not None]
+        inserts = [r for _, r in valid if r['product_id'] is None]
+        previous_max = conn.execute("SELECT COALESCE(MAX(product_id), 0) AS max_id FROM products").fetchone()['max_id']
+        conn.executemany(
+            "INSERT INTO products (category_id, name, description, price, is_active) VALUES (?,?,?,?,?)",
+            [
+                (r['category_id'], r['name'], r['description'] or '', r['price'], 1 if r['is_active'] is None else r['is_active'])
+                for r in inserts
+            ],
+        )
+        for row, product_id in zip(inserts, inserted_ids(conn, 'products', 'product_id', previous_max)):
+            row['product_id'] = product_id
+        conn.executemany(
+            "UPDATE products SET category_id=COALESCE(?, category_id), name=COALESCE(?, name), "
+            "description=COALESCE(?, description), price=COALESCE(?, price), is_active=COALESCE(?, is_active) "
+            "WHERE product_id=?",
+            [(r['category_id'], r['name'], r['description'], r['price'], r['is_active'], r['product_id']) for r in updates],
+        )
+        with_recipes = [r for _, r in valid if r['recipes'] is not None]
+        conn.executemany(DELETE_RECIPES_SQL, [(r['product_id'],) for r in with_recipes])
+        conn.executemany(
+            "INSERT INTO recipes (product_id, ingredient_id, quantity_required) VALUES (?,?,?)",
+            [(r['product_id'], ingredient_id, quantity) for r in with_recipes for ingredient_id, quantity in r['recipes']],
+        )
+        product_ids = [r['product_id'] for _, r in valid]
+        queue_event(conn, 'catalog', {'resource': 'products', 'ids': product_ids})
+        return {"inserted": len(inserts), "updated": len(updates), "product_ids": product_ids}
+
+    if not valid and not errors:
+        raise ValueError("Порожній імпорт")
+    return run_bulk(conn, apply)
+
+
+def _supply_row(row):
+    supply_date = row_field(row, 'supply_date', str)
+    if supply_date:
+        try:
+            supply_date = parse_report_time(supply_date).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            raise ValueError("Некоректна дата поставки")
+    return {
+        'ingredient_id': row_field(row, 'ingredient_id', int, required=True),
+        'quantity_added': row_field(row, 'quantity_added', required=True, minimum=0),
+        'cost': row_field(row, 'cost', minimum=0),
+        'supply_date': supply_date,
+    }
+
+
+def bulk_add_supplies(conn, rows):
+    valid, errors = validate_rows(rows, _supply_row)
+
+    def apply():
+        known = existing_ids(conn, 'ingredients', 'ingredient_id', [r['ingredient_id'] for _, r in valid])
+        for index, row in valid:
+            if row['ingredient_id'] not in known:
+                errors.append({"row": index, "error": "Інгредієнт не знайдено"})
+        if errors:
+            raise BulkValidationError(sorted(errors, key=lambda e: e['row']))
+        conn.executemany(
+            "INSERT INTO supplies (ingredient_id, quantity_added, cost, supply_date) "
+            "VALUES (?,?,?,COALESCE(?, CURRENT_TIMESTAMP))",
+            [(r['ingredient_id'], r['quantity_added'], r['cost'], r['supply_date']) for _, r in valid],
+        )
+        added = {}
+        for _, row in valid:
+            added[row['ingredient_id']] = added.get(row['ingredient_id'], 0) + row['quantity_added']
+        placeholders = ",".join("(?,?)" for _ in added)
+        conn.execute(
+            "UPDATE ingredients SET current_stock = current_stock + d.column2 "
+            f"FROM (VALUES {placeholders}) AS d WHERE ingredients.ingredient_id = d.column1",
+            [value for item in added.items() for value in item],
+        )
+        record_movements(conn, 'supply', added)
+        queue_stock_events(conn, added)
+        return {"supplies": len(valid), "ingredients": len(added)}
+
+    if not valid and not errors:
+        raise ValueError("Порожній імпорт")
+    return run_bulk(conn, apply)
+
+
+def adjust_stock(conn, product_id, quantity):
+    demand = ingredient_demand(conn, {product_id: quantity})
+    deduct_ingredients(conn, demand)
+    record_movements(conn, 'sale', {ingredient_id: -needed for ingredient_id, needed in demand.items()})
+
+
+MOVEMENT_KINDS = ('sale', 'supply', 'correction', 'writeoff')
+LEDGER_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def record_movements(conn, kind, deltas, order_id=None, employee_id=None, note=None):
+    """Append signed stock changes already applied to ingredients.current_stock in this transaction."""
+    conn.executemany(
+        "INSERT INTO stock_movements (ingredient_id, kind, quantity, order_id, employee_id, note) VALUES (?,?,?,?,?,?)",
+        [(ingredient_id, kind, delta, order_id, employee_id, note) for ingredient_id, delta in deltas.items() if delta],
+    )
+
+
+def baseline_snapshots(conn, ingredient_ids):
+    if not ingredient_ids:
+        return
+    placeholders = ",".join("?" for _ in ingredient_ids)
+    conn.execute(
+        "INSERT OR IGNORE INTO stock_snapshots (ingredient_id, taken_at, last_movement_id, stock) "
+        "SELECT ingredient_id, CURRENT_TIMESTAMP, (SELECT COALESCE(MAX(movement_id), 0) FROM stock_movements), "
+        f"current_stock FROM ingredients WHERE ingredient_id IN ({placeholders})",
+        list(ingredient_ids),
+    )
+
+
+def take_stock_snapshot(conn):
+    """Snapshot every ingredient that moved since its last snapshot, carrying the running totals forward."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        last = conn.execute("SELECT COALESCE(MAX(movement_id), 0) AS last FROM stock_movements").fetchone()['last']
+        taken = conn.execute(
+            """
+            INSERT OR REPLACE INTO stock_snapshots (ingredient_id, taken_at, last_movement_id, stock, sold, written_off)
+            SELECT l.ingredient_id, CURRENT_TIMESTAMP, ?, l.current_stock,
+                COALESCE(l.sold, 0) + COALESCE(SUM(CASE WHEN m.kind = 'sale' THEN -m.quantity END), 0),
+                COALESCE(l.written_off, 0) + COALESCE(SUM(CASE WHEN m.kind = 'writeoff' THEN -m.quantity END), 0)
+            FROM (
+                SELECT i.ingredient_id, i.current_stock, s.last_movement_id, s.sold, s.written_off
+                FROM ingredients i
+                LEFT JOIN stock_snapshots s ON s.ingredient_id = i.ingredient_id
+                    AND s.taken_at = (SELECT MAX(taken_at) FROM stock_snapshots WHERE ingredient_id = i.ingredient_id)
+            ) l
+            LEFT JOIN stock_movements m ON m.ingredient_id = l.ingredient_id
+                AND m.movement_id > COALESCE(l.last_movement_id, 0)
+            WHERE l.last_movement_id IS NULL OR m.movement_id IS NOT NULL
+            GROUP BY l.ingredient_id
+            """,
+            (last,),
+        ).rowcount
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return taken
+
+
+def ledger_totals_query(moment, ingredient_id=None):
+    condition, params = ("WHERE i.ingredient_id = ?", [ingredient_id]) if ingredient_id is not None else ("", [])
+    at = moment.strftime(LEDGER_TIME_FORMAT)
+    return (
+        "SELECT i.ingredient_id, i.name, i.unit, i.warning_threshold, "
+        "s.stock + COALESCE(SUM(m.quantity), 0) AS stock, "
+        "s.sold + COALESCE(SUM(CASE WHEN m.kind = 'sale' THEN -m.quantity END), 0) AS sold, "
+        "s.written_off + COALESCE(SUM(CASE WHEN m.kind = 'writeoff' THEN -m.quantity END), 0) AS written_off, "
+        "(SELECT MIN(taken_at) FROM stock_snapshots WHERE ingredient_id = i.ingredient_id) AS tracked_since "
+        "FROM ingredients i "
+        "LEFT JOIN stock_snapshots s ON s.ingredient_id = i.ingredient_id AND s.taken_at = "
+        "(SELECT MAX(taken_at) FROM stock_snapshots WHERE ingredient_id = i.ingredient_id AND taken_at <= ?) "
+        "LEFT JOIN stock_movements m ON m.ingredient_id = i.ingredient_id AND s.taken_at IS NOT NULL "
+        "AND m.movement_id > s.last_movement_id AND m.created_at <= ? "
+        # Anything recorded after the next snapshot is later than moment, so stop the replay there
+        "AND m.movement_id <= COALESCE((SELECT last_movement_id FROM stock_snapshots "
+        "WHERE ingredient_id = i.ingredient_id AND taken_at > ? ORDER BY taken_at LIMIT 1), 9223372036854775807) "
+        f"{condition} GROUP BY i.ingredient_id ORDER BY i.ingredient_id",
+        [at, at, at] + params,
+    )
+
+
+def ledger_totals(conn, moment, ingredient_id=None):
+    """Stock and cumulative sold/written-off quantities per ingredient as of moment.
+
+    Each value is the latest snapshot at or before moment plus a replay of the movements
+    recorded after it; ingredients not yet tracked at that time get None.
+    """
+    return {row['ingredient_id']: row for row in conn.execute(*ledger_totals_query(moment, ingredient_id))}
+
+
+def _ledger_amount(value):
+    return None if value is None else round(value, 4)
+
+
+def stock_at(conn, moment, ingredient_id=None):
+    return [
+        {
+            'ingredient_id': row['ingredient_id'],
+            'name': row['name'],
+            'unit': row['unit'],
+            'stock': _ledger_amount(row['stock']),
+        }
+        for row in ledger_totals(conn, moment, ingredient_id).values()
+    ]
+
+
+def stock_consumption(conn, start, end, ingredient_id=None):
+    """Sold and written-off quantities between start and end from two snapshot lookups.
+
+    per_day averages over the tracked part of the range, counted as at least one day.
+    """
+    before = ledger_totals(conn, start, ingredient_id)
+    report = []
+    for ingredient_id, row in ledger_totals(conn, end, ingredient_id).items():
+        entry = {'ingredient_id': ingredient_id, 'name': row['name'], 'unit': row['unit']}
+        if row['stock'] is None:
+            report.append(dict(entry, sold=None, written_off=None, consumed=None, per_day=None, stock=None))
+            continue
+        # Running totals start at zero when tracking began, so an earlier start counts from there
+        prior = before[ingredient_id]
+        sold = row['sold'] - (prior['sold'] or 0)
+        written_off = row['written_off'] - (prior['written_off'] or 0)
+        since = max(start, datetime.strptime(row['tracked_since'], LEDGER_TIME_FORMAT))
+        days = max((end - since).total_seconds() / 86400, 1.0)
+        report.append(dict(
+            entry,
+            sold=_ledger_amount(sold),
+            written_off=_ledger_amount(written_off),
+            consumed=_ledger_amount(sold + written_off),
+            per_day=_ledger_amount((sold + written_off) / days),
+            stock=_ledger_amount(row['stock']),
+        ))
+    return report
+
+
+def stock_forecast(conn, days=14, now=None):
+    """Days until each ingredient runs out at its average daily consumption over the last days."""
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    forecast = []
+    for row in stock_consumption(conn, now - timedelta(days=days), now):
+        per_day = row['per_day']
+        days_left = runs_out_at = None
+        if per_day and per_day > 0:
+            days_left = max(row['stock'], 0) / per_day
+            runs_out_at = (now + timedelta(days=days_left)).strftime(LEDGER_TIME_FORMAT)
+            days_left = round(days_left, 2)
+        forecast.append({
+            'ingredient_id': row['ingredient_id'],
+            'name': row['name'],
+            'unit': row['unit'],
+            'current_stock': row['stock'],
+            'per_day': per_day,
+            'days_left': days_left,
+            'runs_out_at': runs_out_at,
+        })
+    forecast.sort(key=lambda row: (row['days_left'] is None, row['days_left']))
+    return forecast
+
+
+MOVEMENTS_SQL = (
+    "SELECT movement_id, kind, quantity, created_at, order_id, employee_id, note FROM stock_movements "
+    "WHERE ingredient_id = ? AND movement_id > ? ORDER BY movement_id LIMIT ?"
+)
+
+
+def list_movements(conn, ingredient_id, after=None, limit=100):
+    rows = conn.execute(MOVEMENTS_SQL, (ingredient_id, after or 0, limit + 1)).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]['movement_id']
+    return {"movements": rows, "next_cursor": next_cursor}
+
+
+def write_off(conn, ingredient_id, quantity, employee_id=None, note=None):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        updated = conn.execute(
+            "UPDATE ingredients SET current_stock = current_stock - ? WHERE ingredient_id = ? AND current_stock >= ?",
+            (quantity, ingredient_id, quantity),
+        ).rowcount
+        if not updated:
+            row = conn.execute(
+                "SELECT ingredient_id, name, unit, current_stock AS available FROM ingredients WHERE ingredient_id = ?",
+                (ingredient_id,),
+            ).fetchone()
+            if row is None:
+                raise LookupError("Інгредієнт не знайдено")
+            raise StockShortageError([dict(row, required=quantity)])
+        record_movements(conn, 'writeoff', {ingredient_id: -quantity}, employee_id=employee_id, note=note)
+        queue_stock_events(conn, {ingredient_id: -quantity})
+        stock = conn.execute(
+            "SELECT current_stock FROM ingredients WHERE ingredient_id = ?", (ingredient_id,)
+        ).fetchone()['current_stock']
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return stock
+
+
+def run_snapshots(interval=SNAPSHOT_INTERVAL):
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            conn = get_db()
+            try:
+                take_stock_snapshot(conn)
+            except sqlite3.Error:
+                traceback.print_exc()
+            finally:
+                conn.close()
+
+    thread = threading.Thread(target=loop, name="stock-snapshots", daemon=True)
+    thread.start()
+    return thread
+
+
+def archive_orders(conn, before, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move orders placed before `before` into the archive file, one batch per transaction.
+
+    Copy and delete share one transaction, so an error mid-batch rolls back both files. In WAL
+    mode a crash during that commit can still land the copy without the delete; reads then
+    skip archive rows whose order is still in the hot file (ARCHIVED_ONLY), and the next run
+    finishes the batch since the copies are INSERT OR IGNORE.
+    """
+    cutoff = before.strftime('%Y-%m-%d %H:%M:%S')
+    moved = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = [
+                row['order_id']
+                for row in conn.execute(
+                    "SELECT order_id FROM main.orders WHERE order_date < ? ORDER BY order_date, order_id LIMIT ?",
+                    (cutoff, batch_size),
+                )
+            ]
+            if not ids:
+                conn.rollback()
+                return moved
+            placeholders = ",".join("?" for _ in ids)
+            conn.execute(
+                f"INSERT OR IGNORE INTO archive.orders ({ORDER_TABLE_COLUMNS}) "
+                f"SELECT {ORDER_TABLE_COLUMNS} FROM main.orders WHERE order_id IN ({placeholders})",
+                ids,
+            )
+            conn.execute(
+                f"INSERT OR IGNORE INTO archive.order_details ({ORDER_DETAIL_COLUMNS}) "
+                f"SELECT {ORDER_DETAIL_COLUMNS} FROM main.order_details WHERE order_id IN ({placeholders})",
+                ids,
+            )
+            conn.execute(f"DELETE FROM main.order_details WHERE order_id IN ({placeholders})", ids)
+            conn.execute(f"DELETE FROM main.orders WHERE order_id IN ({placeholders})", ids)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        moved += len(ids)
+
+
+def normalize_order_items(items):
+    lines = []
+    for item in items:
+        product_id = item.get('product_id') if isinstance(item, dict) else None
+        quantity = item.get('quantity', 1) if isinstance(item, dict) else None
+        if not isinstance(product_id, int) or isinstance(product_id, bool):
+            raise ValueError("Некоректний товар")
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise ValueError("Некоректна кількість")
+        lines.append((product_id, quantity))
+    if not lines:
+        raise ValueError("Порожнє замовлення")
+    return lines
+
+
+PRODUCT_PRICES_SQL = "SELECT product_id, price FROM products WHERE product_id IN ({placeholders})"
+
+
+def place_order(conn, employee_id, lines, payment_method):
+    quantities = {}
+    for product_id, quantity in lines:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    placeholders = ",".join("?" for _ in quantities)
+    prices = {
+        row['product_id']: row['price']
+        for row in conn.execute(PRODUCT_PRICES_SQL.format(placeholders=placeholders), list(quantities))
+    }
+    if len(prices) != len(quantities):
+        raise ValueError("Товар не знайдено")
+    total = sum(prices[product_id] * quantity for product_id, quantity in lines)
+    demand = ingredient_demand(conn, quantities)
+    deduct_ingredients(conn, demand)
+    cur = conn.execute(
+        "INSERT INTO orders (employee_id, total_amount, payment_method, status) VALUES (?,?,?,?)",
+        (employee_id, total, payment_method, 'Paid'),
+    )
+    order_id = cur.lastrowid
+    record_movements(
+        conn, 'sale', {ingredient_id: -needed for ingredient_id, needed in demand.items()}, order_id, employee_id
+    )
+    conn.executemany(
+        "INSERT INTO order_details (order_id, product_id, quantity, price_at_sale) VALUES (?,?,?,?)",
+        [(order_id, product_id, quantity, prices[product_id]) for product_id, quantity in lines],
+    )
+    record_sales_rollup(conn, [order_id])
+    return order_id, total
+
+
+class IdempotencyConflictError(ValueError):
+    def __init__(self):
+        super().__init__("Ключ ідемпотентності вже використано для іншого замовлення")
+
+
+class IdempotencyKey:
+    def __init__(self, employee_id, key, fingerprint):
+        self.scope = (employee_id, key)
+        self.fingerprint = fingerprint
+        self.replayed = False
+
+
+def order_fingerprint(items, payment_method):
+    canonical = json.dumps({'items': items, 'payment_method': payment_method}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+IDEMPOTENCY_LOOKUP_SQL = (
+    "SELECT fingerprint, order_id, total_amount FROM idempotency_keys "
+    "WHERE employee_id = ? AND idempotency_key = ? AND created_at > ?"
+)
+
+
+def stored_order(conn, idempotency):
+    row = conn.execute(IDEMPOTENCY_LOOKUP_SQL, (*idempotency.scope, time.time() - IDEMPOTENCY_TTL)).fetchone()
+    if row is None:
+        return None
+    if row['fingerprint'] != idempotency.fingerprint:
+        raise IdempotencyConflictError()
+    return row['order_id'], row['total_amount']
+
+
+def place_order_once(conn, employee_id, lines, payment_method, idempotency=None):
+    """place_order that, inside the caller's write transaction, replays an order already committed under the key."""
+    if idempotency is None:
+        return place_order(conn, employee_id, lines, payment_method)
+    stored = stored_order(conn, idempotency)
+    if stored is not None:
+        idempotency.replayed = True
+        return stored
+    order_id, total = place_order(conn, employee_id, lines, payment_method)
+    conn.execute(
+        "INSERT OR REPLACE INTO idempotency_keys "
+        "(employee_id, idempotency_key, fingerprint, order_id, total_amount, created_at) VALUES (?,?,?,?,?,?)",
+        (*idempotency.scope, idempotency.fingerprint, order_id, total, time.time()),
+    )
+    idempotent_orders.purge(conn)
+    return order_id, total
+
+
+class IdempotencyStore:
+    """Front cache and in-flight registry for checkouts carrying an Idempotency-Key.
+
+    Committed results are kept per (employee, key) in a bounded LRU, so a retry is answered
+    without touching the database. A duplicate arriving while the first request is still
+    running waits for it instead of racing it; if the first one fails nothing is stored and
+    the next waiter runs the checkout itself. The idempotency_keys table, checked inside the
+    write transaction, stays authoritative across restarts and prefork workers.
+    """
+
+    def __init__(self, capacity=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.next_purge = 0.0
+
+    def cached(self, idempotency):
+        entry = self.entries.get(idempotency.scope)
+        if entry is None:
+            return None
+        fingerprint, result, expires = entry
+        if expires <= time.time():
+            del self.entries[idempotency.scope]
+            return None
+        if fingerprint != idempotency.fingerprint:
+            raise IdempotencyConflictError()
+        self.entries.move_to_end(idempotency.scope)
+        return result
+
+    def run(self, idempotency, place):
+        while True:
+            with self.lock:
+                result = self.cached(idempotency)
+                if result is not None:
+                    idempotency.replayed = True
+                    return result
+                pending = self.in_flight.get(idempotency.scope)
+                if pending is None:
+                    pending = self.in_flight[idempotency.scope] = threading.Event()
+                    break
+            pending.wait()
+        try:
+            result = place()
+            with self.lock:
+                self.entries[idempotency.scope] = (idempotency.fingerprint, result, time.time() + self.ttl)
+                self.entries.move_to_end(idempotency.scope)
+                while len(self.entries) > self.capacity:
+                    self.entries.popitem(last=False)
+            return result
+        finally:
+            with self.lock:
+                del self.in_flight[idempotency.scope]
+            pending.set()
+
+    def purge(self, conn):
+        now = time.time()
+        if now < self.next_purge:
+            return
+        self.next_purge = now + 60
+        conn.execute("DELETE FROM idempotency_keys WHERE created_at <= ?", (now - self.ttl,))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+idempotent_orders = IdempotencyStore()
+
+
+def checkout(conn, employee_id, items, payment_method='Card', idempotency=None):
+    lines = normalize_order_items(items)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        order_id, total = place_order_once(conn, employee_id, lines, payment_method, idempotency)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return order_id, total
+
+
+class OrderWriter:
+    """Single writer thread that group-commits checkouts arriving within a short window.
+
+    Every order runs in its own savepoint, so a shortage rolls back only that order while
+    the rest of the batch shares one transaction and one fsync. Callers block on their
+    own result, so responses stay synchronous. The window is cut short once every
+    waiting caller is already in the batch, since nobody else can add to it.
+    """
+
+    def __init__(self, batch_size=ORDER_BATCH_SIZE, window=ORDER_BATCH_WINDOW, timeout=ORDER_TIMEOUT):
+        self.batch_size = max(batch_size, 1)
+        self.window = window
+        self.timeout = timeout
+        self.queue = queue.Queue(self.batch_size * 32)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.waiting = 0
+        self.batches = 0
+        self.orders = 0
+
+    def submit(self, employee_id, items, payment_method='Card', idempotency=None):
+        lines = normalize_order_items(items)
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name="order-writer", daemon=True)
+                    self.thread.start()
+        future = Future()
+        with self.lock:
+            self.waiting += 1
+        try:
+            try:
+                self.queue.put((employee_id, lines, payment_method, idempotency, future), timeout=self.timeout)
+            except queue.Full:
+                raise TimeoutError("order writer queue is full")
+            return future.result(self.timeout)
+        finally:
+            with self.lock:
+                self.waiting -= 1
+
+    def collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < min(self.batch_size, self.waiting):
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.collect()
+            try:
+                conn = get_db()
+                try:
+                    self.write(conn, batch)
+                finally:
+                    conn.close()
+            except Exception as exc:
+                # Fail this batch, not the writer: a dead thread would leave every later order hanging
+                traceback.print_exc()
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def write(self, conn, batch):
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for employee_id, lines, payment_method, idempotency, future in batch:
+                mark = len(conn.pending_events)
+                conn.execute("SAVEPOINT batch_order")
+                try:
+                    results.append(
+                        (future, place_order_once(conn, employee_id, lines, payment_method, idempotency), None)
+                    )
+                except sqlite3.OperationalError:
+                    raise
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO batch_order")
+                    del conn.pending_events[mark:]
+                    results.append((future, None, exc))
+                conn.execute("RELEASE batch_order")
+            conn.commit()
+        except BaseException as exc:
+            conn.rollback()
+            for *_, future in batch:
+                future.set_exception(exc)
+            return
+        self.batches += 1
+        self.orders += len(batch)
+        for future, result, exc in results:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+order_writer = OrderWriter() if ORDER_WRITER else None
+
+
+def submit_checkout(employee_id, items, payment_method='Card', idempotency=None):
+    def place():
+        if order_writer is not None:
+            return order_writer.submit(employee_id, items, payment_method, idempotency)
+        conn = get_db()
+        try:
+            return checkout(conn, employee_id, items, payment_method, idempotency)
+        finally:
+            conn.close()
+
+    if idempotency is None:
+        return place()
+    return idempotent_orders.run(idempotency, place)
+
+
+REPORT_GROUPS = ('payment_method', 'employee', 'product', 'hour', 'day')
+
+
+def parse_report_time(value, end=False):
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    if end and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+
+def months_ago(moment, months):
+    month_index = moment.year * 12 + moment.month - 1 - months
+    year, month = divmod(month_index, 12)
+    month += 1
+    next_month = datetime(year + month // 12, month % 12 + 1, 1)
+    day = min(moment.day, (next_month - timedelta(days=1)).day)
+    return moment.replace(year=year, month=month, day=day)
+
+
+def report_range(query):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    end = parse_report_time(query['to'][0], end=True) if query.get('to') else now
+    if query.get('from'):
+        start = parse_report_time(query['from'][0])
+    else:
+        period = query.get('period', ['day'])[0]
+        if period == 'day':
+            start = end - timedelta(days=1)
+        elif period == 'week':
+            start = end - timedelta(days=7)
+        else:
+            start = months_ago(end, 1)
+    if start >= end:
+        raise ValueError("Некоректний період")
+    return start, end
+
+
+def rollup_segments(start, end, granularities=('hour', 'day')):
+    start = start.replace(minute=0, second=0, microsecond=0)
+    if end.minute or end.second or end.microsecond:
+        end = end.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    if 'day' not in granularities:
+        return [('hour', start, end)]
+    first_day = start.replace(hour=0)
+    if first_day < start:
+        first_day += timedelta(days=1)
+    last_day = end.replace(hour=0)
+    if first_day >= last_day:
+        return [('hour', start, end)]
+    segments = []
+    if start < first_day:
+        segments.append(('hour', start, first_day))
+    segments.append(('day', first_day, last_day))
+    if last_day < end:
+        segments.append(('hour', last_day, end))
+    return segments
+
+
+def rollup_source(table, columns, segments):
+    formats = {granularity: fmt for granularity, _, fmt in ROLLUP_BUCKETS}
+    parts = []
+    params = []
+    for granularity, lo, hi in segments:
+        parts.append(f"SELECT {columns} FROM {table} WHERE granularity=? AND bucket>=? AND bucket<?")
+        params += [granularity, lo.strftime(formats[granularity]), hi.strftime(formats[granularity])]
+    return "(" + " UNION ALL ".join(parts) + ")", params
+
+
+def sales_report(conn, start, end, group_by=None):
+    segments = rollup_segments(start, end)
+    source, params = rollup_source(
+        "sales_rollup", "bucket, payment_method, employee_id, order_count, total_amount", segments
+    )
+    report = conn.execute(
+        f"SELECT SUM(total_amount) AS total, COALESCE(SUM(order_count), 0) AS count FROM {source}",
+        params,
+    ).fetchone()
+    # Buckets are whole hours, so echo the range that was actually summed
+    report['from'] = segments[0][1].strftime('%Y-%m-%d %H:%M:%S')
+    report['to'] = segments[-1][2].strftime('%Y-%m-%d %H:%M:%S')
+    if group_by == 'payment_method':
+        report['breakdown'] = conn.execute(
+            "SELECT payment_method, SUM(order_count) AS count, SUM(total_amount) AS total "
+            f"FROM {source} GROUP BY payment_method ORDER BY total DESC",
+            params,
+        ).fetchall()
+    elif group_by == 'employee':
+        report['breakdown'] = conn.execute(
+            "SELECT r.employee_id, e.name, SUM(r.order_count) AS count, SUM(r.total_amount) AS total "
+            f"FROM {source} r LEFT JOIN employees e ON e.employee_id = r.employee_id "
+            "GROUP BY r.employee_id ORDER BY total DESC",
+            params,
+        ).fetchall()
+    elif group_by == 'product':
+        source, params = rollup_source("product_sales_rollup", "bucket, product_id, quantity, revenue", segments)
+        report['breakdown'] = conn.execute(
+            "SELECT r.product_id, p.name, SUM(r.quantity) AS quantity, SUM(r.revenue) AS revenue "
+            f"FROM {source} r LEFT JOIN products p ON p.product_id = r.product_id "
+            "GROUP BY r.product_id ORDER BY revenue DESC",
+            params,
+        ).fetchall()
+    elif group_by in ('hour', 'day'):
+        if group_by == 'hour':
+            source, params = rollup_source(
+                "sales_rollup", "bucket, order_count, total_amount", rollup_segments(start, end, ('hour',))
+            )
+        report['breakdown'] = conn.execute(
+            f"SELECT substr(bucket, 1, {19 if group_by == 'hour' else 10}) AS bucket, "
+            "SUM(order_count) AS count, SUM(total_amount) AS total "
+            f"FROM {source} GROUP BY 1 ORDER BY 1",
+            params,
+        ).fetchall()
+    return report
+
+
+HASHED_ASSET_RE = re.compile(r'(^|/)assets/|[.-][0-9a-f]{8,}\.\w+$')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+class StaticFileCache:
+    def __init__(self, max_bytes, max_file_bytes):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        st = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                self._entries.move_to_end(path)
+                return entry
+        if st.st_size > self.max_file_bytes:
+            return None
+        entry = self._load(path, st)
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous:
+                self._size -= previous['weight']
+            self._entries[path] = entry
+            self._size += entry['weight']
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted['weight']
+        return entry
+
+    def _load(self, path, st):
+        with open(path, 'rb') as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        variants = {'identity': body}
+        if content_type.startswith(COMPRESSIBLE_TYPES) and len(body) > 256:
+            for encoding, suffix, compress in (
+                ('br', '.br', brotli.compress if brotli else None),
+                ('gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0)),
+            ):
+                try:
+                    if os.stat(path + suffix).st_mtime_ns >= st.st_mtime_ns:
+                        with open(path + suffix, 'rb') as f:
+                            variants[encoding] = f.read()
+                        continue
+                except OSError:
+                    pass
+                if compress:
+                    compressed = compress(body)
+                    if len(compressed) < len(body):
+                        variants[encoding] = compressed
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        relative = os.path.relpath(path, FRONTEND_DIR).replace(os.sep, '/')
+        if HASHED_ASSET_RE.search(relative):
+            cache_control = 'public, max-age=31536000, immutable'
+        elif STATIC_MAX_AGE:
+            cache_control = f'public, max-age={STATIC_MAX_AGE}, must-revalidate'
+        else:
+            cache_control = 'no-cache'
+        return {
+            'mtime_ns': st.st_mtime_ns,
+            'size': st.st_size,
+            'mtime': int(st.st_mtime),
+            'variants': variants,
+            'weight': sum(len(v) for v in variants.values()),
+            'etag': '"' + hashlib.sha1(body).hexdigest()[:20] + '"',
+            'last_modified': email.utils.formatdate(st.st_mtime, usegmt=True),
+            'content_type': content_type,
+            'cache_control': cache_control,
+        }
+
+
+static_cache = StaticFileCache(STATIC_CACHE_BYTES, STATIC_MAX_FILE_BYTES)
+
+
+def etag_matches(if_none_match, etag):
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags
+
+
+def not_modified(headers, entry):
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        return etag_matches(if_none_match, entry['etag'])
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return since is not None and entry['mtime'] <= since.timestamp()
+    return False
+
+
+def choose_encoding(accept_encoding, variants):
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ('br', 'gzip'):
+        if encoding in variants and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return 'identity'
+
+
+BULK_IMPORTS = {
+    '/api/ingredients/bulk': bulk_upsert_ingredients,
+    '/api/products/bulk': bulk_upsert_products,
+    '/api/supplies/bulk': bulk_add_supplies,
+}
+
+PUBLIC = 'public'
+STAFF = 'staff'
+ADMIN = 'Admin'
+
+PARAM_TYPES = {'int': int, 'str': str}
+
+
+# Worker-pool scheduling classes: lower values run first and are shed last
+CHECKOUT, INTERACTIVE, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = ('checkout', 'interactive', 'background')
+
+
+class Route:
+    __slots__ = ('method', 'pattern', 'handler', 'role', 'query_token', 'priority', 'stream')
+
+    def __init__(self, method, pattern, handler, role, query_token=False, priority=INTERACTIVE, stream=False):
+        self.method = method
+        self.pattern = pattern
+        self.handler = handler
+        self.role = role
+        self.query_token = query_token
+        self.priority = priority
+        self.stream = stream
+
+
+class Router:
+    """Compiled route table: exact paths in a dict, parameterised ones in a segment trie."""
+
+    def __init__(self, routes=()):
+        self.static = {}
+        self.static_methods = {}
+        self.tree = {'children': {}, 'params': [], 'routes': {}}
+        for method, pattern, handler, role, *options in routes:
+            self.add(method, pattern, handler, role, **(options[0] if options else {}))
+
+    def add(self, method, pattern, handler, role=STAFF, query_token=False, priority=INTERACTIVE, stream=False):
+        route = Route(method, pattern, handler, role, query_token, priority, stream)
+        if '{' not in pattern:
+            self.static[(method, pattern)] = route
+            self.static_methods.setdefault(pattern, set()).add(method)
+            return route
+        node = self.tree
+        for segment in pattern.strip('/').split('/'):
+            if segment.startswith('{') and segment.endswith('}'):
+                name, _, kind = segment[1:-1].partition(':')
+                convert = PARAM_TYPES[kind or 'str']
+                for param in node['params']:
+                    if param[0] == name and param[1] is convert:
+                        node = param[2]
+                        break
+                else:
+                    child = {'children': {}, 'params': [], 'routes': {}}
+                    node['params'].append((name, convert, child))
+                    node = child
+            else:
+                node = node['children'].setdefault(segment, {'children': {}, 'params': [], 'routes': {}})
+        if method in node['routes']:
+            raise ValueError(f"duplicate route {method} {pattern}")
+        node['routes'][method] = route
+        return route
+
+    def _walk(self, node, segments, index, params):
+        if index == len(segments):
+            return node if node['routes'] else None
+        child = node['children'].get(segments[index])
+        if child is not None:
+            found = self._walk(child, segments, index + 1, params)
+            if found is not None:
+                return found
+        for name, convert, child in node['params']:
+            try:
+                params[name] = convert(segments[index])
+            except ValueError:
+                continue
+            found = self._walk(child, segments, index + 1, params)
+            if found is not None:
+                return found
+            del params[name]
+        return None
+
+    def match(self, method, path):
+        """Return (route, params, allowed_methods); route is None when nothing matches."""
+        route = self.static.get((method, path))
+        if route is not None:
+            return route, {}, None
+        params = {}
+        node = self._walk(self.tree, path.strip('/').split('/'), 0, params)
+        allowed = set(self.static_methods.get(path, ()))
+        if node is not None:
+            route = node['routes'].get(method)
+            if route is not None:
+                return route, params, None
+            allowed.update(node['routes'])
+        return None, {}, allowed
+
+
+def query_value(query, name, default=None):
+    return query.get(name, [default])[0]
+
+
+def api_login(handler, user):
+    body = read_json(handler)
+    try:
+        data, error = handle_login(body)
+    except AuthBusyError as exc:
+        send_json(handler, {"error": str(exc)}, HTTPStatus.SERVICE_UNAVAILABLE, {'Retry-After': '1'})
+        return
+    if error:
+        send_json(handler, {"error": error}, HTTPStatus.UNAUTHORIZED)
+    else:
+        send_json(handler, data)
+
+
+def api_create_order(handler, user):
+    body = read_json(handler)
+    items = body.get('items', [])
+    payment_method = body.get('payment_method', 'Card')
+    if not items:
+        send_json(handler, {"error": "Порожнє замовлення"}, HTTPStatus.BAD_REQUEST)
+        return
+    idempotency = None
+    key = handler.headers.get('Idempotency-Key')
+    if key is not None:
+        if not key or len(key) > 255:
+            send_json(handler, {"error": "Некоректний ключ ідемпотентності"}, HTTPStatus.BAD_REQUEST)
+            return
+        idempotency = IdempotencyKey(user['employee_id'], key, order_fingerprint(items, payment_method))
+    try:
+        order_id, total = submit_checkout(user['employee_id'], items, payment_method, idempotency)
+    except IdempotencyConflictError as exc:
+        metrics.record_idempotency('conflict')
+        send_json(handler, {"error": str(exc)}, HTTPStatus.UNPROCESSABLE_ENTITY)
+        return
+    except StockShortageError as exc:
+        send_json(handler, {"error": str(exc), "shortages": exc.shortages}, HTTPStatus.BAD_REQUEST)
+        return
+    except ValueError as exc:
+        send_json(handler, {"error": str(exc)}, HTTPStatus.BAD_REQUEST)
+        return
+    except TimeoutError:
+        # The writer may still commit it; a retry with the same Idempotency-Key gets that order back
+        send_json(handler, {"error": "Замовлення ще обробляється, спробуйте ще раз"},
+                  HTTPStatus.SERVICE_UNAVAILABLE, {'Retry-After': '1'})
+        return
+    response = {"message": "Замовлення оформлено", "order_id": order_id, "total": total}
+    if idempotency is not None and idempotency.replayed:
+        metrics.record_idempotency('replayed')
+        send_json(handler, response, headers={'Idempotent-Replayed': 'true'})
+        return
+    bump_data_version()
+    send_json(handler, response)
+
+
+def api_list_orders(handler, user):
+    query = handler.query
+    filters = {
+        'from': query_value(query, 'from'),
+        'to': query_value(query, 'to'),
+        'employee_id': query_value(query, 'employee_id'),
+        'status': query_value(query, 'status'),
+    }
+    try:
+        for name in ('from', 'to'):
+            if filters[name]:
+                filters[name] = parse_report_time(filters[name], end=name == 'to').strftime('%Y-%m-%d %H:%M:%S')
+        if filters['employee_id'] is not None:
+            filters['employee_id'] = int(filters['employee_id'])
+        if user['role'] != 'Admin':
+            filters['employee_id'] = user['employee_id']
+        cursor = query_value(query, 'cursor')
+        stream = query_value(query, 'format', '') == 'ndjson'
+        limit = page_size(query, 50) if 'limit' in query or not stream else None
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as exc:
+        send_json(handler, {"error": str(exc)}, HTTPStatus.BAD_REQUEST)
+        return
+    conn = get_db()
+    try:
+        if stream:
+            send_ndjson(handler, iter_orders(conn, filters, cursor, limit))
+        else:
+            send_json(handler, list_orders(conn, filters, cursor, limit))
+    finally:
+        conn.close()
+
+
+def response_format(query, formats):
+    value = query_value(query, 'format', 'json')
+    if value not in formats:
+        raise ValueError("Невідомий формат")
+    return value
+
+
+def api_list_products(handler, user):
+    try:
+        fmt = response_format(handler.query, ('json', 'columnar'))
+    except ValueError as exc:
+        send_json(handler, {"error": str(exc)}, HTTPStatus.BAD_REQUEST)
+        return
+    category_id = query_value(handler.query, 'category_id')
+    try:
+        category_id = int(category_id) if category_id else None
+    except ValueError:
+        send_json(handler, {"error": "Некоректна категорія"}, HTTPStatus.BAD_REQUEST)
+        return
+    columnar = fmt == 'columnar'
+    handler.send_catalog(
+        f"products-{category_id or 'all'}-{fmt}", lambda: get_products(category_id, columnar)
+    )
+
+
+def api_create_product(handler, user):
+    body = read_json(handler)
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO products (category_id, name, description, price, is_active) VALUES (?,?,?,?,1)",
+        (
+            body.get('category_id'),
+            body.get('name'),
+            body.get('description', ''),
+            body.get('price'),
+        ),
+    )
+    new_id = cur.lastrowid
+    queue_event(conn, 'catalog', {'resource': 'products', 'ids': [new_id]})
+    conn.commit()
+    bump_data_version()
+    conn.close()
+    send_json(handler, {"product_id": new_id})
+
+
+def api_update_product(handler, user, product_id):
+    body = read_json(handler)
+    conn = get_db()
+    conn.execute(
+        "UPDATE products SET category_id=?, name=?, description=?, price=?, is_active=? WHERE product_id=?",
+        (
+            body.get('category_id'),
+            body.get('name'),
+            body.get('description', ''),
+            body.get('price'),
+            1 if body.get('is_active', True) else 0,
+            product_id,
+        ),
+    )
+    queue_event(conn, 'catalog', {'resource': 'products', 'ids': [product_id]})
+    conn.commit()
+    bump_data_version()
+    conn.close()
+    send_json(handler, {"message": "Продукт оновлено"})
+
+
+def api_update_recipes(handler, user, product_id):
+    body = read_json(handler)
+    recipe_items = body.get('recipes', [])
+    conn = get_db()
+    conn.execute(DELETE_RECIPES_SQL, (product_id,))
+    conn.executemany(
+        "INSERT INTO recipes (product_id, ingredient_id, quantity_required) VALUES (?,?,?)",
+        [(product_id, r['ingredient_id'], r['quantity_required']) for r in recipe_items],
+    )
+    queue_event(conn, 'catalog', {'resource': 'products', 'ids': [product_id]})
+    conn.commit()
+    bump_data_version()
+    conn.close()
+    send_json(handler, {"message": "Рецепт оновлено"})
+
+
+def api_list_ingredients(handler, user):
+    query = handler.query
+    try:
+        fmt = response_format(query, ('json', 'columnar', 'ndjson'))
+    except ValueError as exc:
+        send_json(handler, {"error": str(exc)}, HTTPStatus.BAD_REQUEST)
+        return
+    columnar = fmt == 'columnar'
+    if fmt != 'ndjson' and not query.keys() - {'format'}:
+        handler.send_catalog(f'ingredients-{fmt}', lambda: list_ingredients(columnar))
+        return
+    try:
+        after = int(query_value(query, 'after', 0))
+        limit = page_size(query, 100)
+    except ValueError:
+        send_json(handler, {"error": "Некоректний курсор"}, HTTPStatus.BAD_REQUEST)
+        return
+    conn = get_db()
+    try:
+        if fmt == 'ndjson':
+            send_ndjson(handler, iter_ingredients(conn, after))
+        else:
+            send_json(handler, list_ingredients_page(conn, after, limit, columnar))
+    finally:
+        conn.close()
+
+
+def api_create_ingredient(handler, user):
+    body = read_json(handler)
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO ingredients (name, current_stock, unit, warning_threshold) VALUES (?,?,?,?)",
+        (body['name'], body.get('current_stock', 0), body.get('unit', ''), body.get('warning_threshold', 0)),
+    )
+    new_id = cur.lastrowid
+    baseline_snapshots(conn, [new_id])
+    queue_event(conn, 'catalog', {'resource': 'ingredients', 'ids': [new_id]})
+    conn.commit()
+    bump_data_version()
+    conn.close()
+    send_json(handler, {"ingredient_id": new_id})
+
+
+def api_update_ingredient(handler, user, ingredient_id):
+    body = read_json(handler)
+    try:
+        stock = row_field(body, 'current_stock')
+        threshold = row_field(body, 'warning_threshold')
+    except ValueError as exc:
+        send_json(handler, {"error": str(exc)}, HTTPStatus.BAD_REQUEST)
+        return
+    stock = 0.0 if stock is None else stock
+    threshold = 0.0 if threshold is None else threshold
+    conn = get_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        previous = stock_levels(conn, [ingredient_id])
+        conn.execute(
+            "UPDATE ingredients SET name=?, current_stock=?, unit=?, warning_threshold=? WHERE ingredient_id=?",
+            (body.get('name'), stock, body.get('unit', ''), threshold, ingredient_id),
+        )
+        if previous:
+            record_movements(
+                conn, 'correction', {ingredient_id: stock - previous[ingredient_id][0]},
+                employee_id=user['employee_id'],
+            )
+        queue_event(conn, 'catalog', {'resource': 'ingredients', 'ids': [ingredient_id]})
+        queue_stock_events(conn, previous=previous)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    bump_data_version()
+    send_json(handler, {"message": "Інгредієнт оновлено"})
+
+
+def api_write_off_ingredient(handler, user, ingredient_id):
+    body = read_json(handler)
+    quantity = body.get('quantity')
+    note = body.get('note')
+    if not isinstance(quantity, (int, float)) or isinstance(quantity, bool) or quantity <= 0:
+        send_json(handler, {"error": "Некоректна кількість"}, HTTPStatus.BAD_REQUEST)
+        return
+    if note is not None and not isinstance(note, str):
+        send_json(handler, {"error": "Некоректний коментар"}, HTTPStatus.BAD_REQUEST)
+        return
+    conn = get_db()
+    try:
+        stock = write_off(conn, ingredient_id, quantity, user['employee_id'], note)
+    except LookupError as exc:
+        send_json(handler, {"error": str(exc)}, HTTPStatus.NOT_FOUND)
+        return
+    except StockShortageError as exc:
+        send_json(handler, {"error": str(exc), "shortages": exc.shortages}, HTTPStatus.BAD_REQUEST)
+        return
+    finally:
+        conn.close()
+    bump_data_version()
+    send_json(handler, {"message": "Списання збережено", "current_stock": stock})
+
+
+def api_ingredient_movements(handler, user, ingredient_id):
+    try:
+        after = int(query_value(handler.query, 'after', 0))
+        limit = page_size(handler.query, 100)
+    except ValueError:
+        send_json(handler, {"error": "Некоректний курсор"}, HTTPStatus.BAD_REQUEST)
+        return
+    conn = get_db()
+    try:
+        send_json(handler, list_movements(conn, ingredient_id, after, limit))
+    finally:
+        conn.close()
+
+
+def optional_ingredient(query):
+    value = query_value(query, 'ingredient_id')
+    return None if value is None else int(value)
+
+
+def api_stock_levels(handler, user):
+    try:
+        at = query_value(handler.query, 'at')
+        moment = parse_report_time(at) if at else datetime.now(timezone.utc).replace(tzinfo=None)
+        ingredient_id = optional_ingredient(handler.query)
+    except ValueError:
+        send_json(handler, {"error": "Некоректні параметри"}, HTTPStatus.BAD_REQUEST)
+        return
+    conn = get_db()
+    try:
+        levels = stock_at(conn, moment, ingredient_id)
+    finally:
+        conn.close()
+    send_json(handler, {"at": moment.strftime(LEDGER_TIME_FORMAT), "ingredients": levels})
+
+
+def api_stock_consumption(handler, user):
+    try:
+        start, end = report_range(handler.query)
+        ingredient_id = optional_ingredient(handler.query)
+    except ValueError:
+        send_json(handler, {"error": "Некоректні параметри"}, HTTPStatus.BAD_REQUEST)
+        return
+    conn = get_db()
+    try:
+        report = stock_consumption(conn, start, end, ingredient_id)
+    finally:
+        conn.close()
+    send_json(handler, {
+        "from": start.strftime(LEDGER_TIME_FORMAT),
+        "to": end.strftime(LEDGER_TIME_FORMAT),
+        "ingredients": report,
+    })
+
+
+def api_stock_forecast(handler, user):
+    try:
+        days = int(query_value(handler.query, 'days', 14))
+        if not 1 <= days <= 365:
+            raise ValueError
+    except ValueError:
+        send_json(handler, {"error": "Некоректний період"}, HTTPStatus.BAD_REQUEST)
+        return
+    conn = get_db()
+    try:
+        forecast = stock_forecast(conn, days)
+    finally:
+        conn.close()
+    send_json(handler, {"days": days, "ingredients": forecast})
+
+
+def api_bulk_import(handler, user):
+    try:
+        rows = read_rows(handler)
+    except (ValueError, csv.Error) as exc:
+        send_json(handler, {"error": "Некоректний формат даних", "detail": str(exc)}, HTTPStatus.BAD_REQUEST)
+        return
+    conn = get_db()
+    try:
+        result = BULK_IMPORTS[handler.route](conn, rows)
+    except BulkValidationError as exc:
+        send_json(handler, {"error": str(exc), "errors": exc.errors}, HTTPStatus.BAD_REQUEST)
+        return
+    except ValueError as exc:
+        send_json(handler, {"error": str(exc)}, HTTPStatus.BAD_REQUEST)
+        return
+    finally:
+        conn.close()
+    bump_data_version()
+    send_json(handler, result)
+
+
+def create_employee(conn, name, role, phone, password):
+    cur = conn.execute(
+        "INSERT INTO employees (name, role, phone, password_hash, is_active) VALUES (?,?,?,?,1)",
+        (name, role, phone, hash_password(password)),
+    )
+    conn.commit()
+    return cur.lastrowid
+
+
+def api_create_employee(handler, user):
+    body = read_json(handler)
+    required_fields = ['name', 'phone', 'password']
+    if not all(body.get(f) for f in required_fields):
+        send_json(handler, {"error": "Вкажіть ім'я, телефон та пароль"}, HTTPStatus.BAD_REQUEST)
+        return
+    role = body.get('role', 'Barista')
+    if role not in ('Admin', 'Barista'):
+        send_json(handler, {"error": "Невідома роль"}, HTTPStatus.BAD_REQUEST)
+        return
+    conn = get_db()
+    try:
+        employee_id = create_employee(conn, body['name'], role, body['phone'], body['password'])
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        send_json(handler, {"error": "Телефон уже використовується"}, HTTPStatus.BAD_REQUEST)
+        return
+    finally:
+        conn.close()
+    send_json(handler, {"employee_id": employee_id, "role": role})
+
+
+def api_sales_report(handler, user):
+    query = handler.query
+    group_by = query_value(query, 'group_by')
+    if group_by and group_by not in REPORT_GROUPS:
+        send_json(handler, {"error": "Невідоме групування"}, HTTPStatus.BAD_REQUEST)
+        return
+    try:
+        start, end = report_range(query)
+    except ValueError:
+        send_json(handler, {"error": "Некоректний період"}, HTTPStatus.BAD_REQUEST)
+        return
+    conn = get_db()
+    report = sales_report(conn, start, end, group_by)
+    conn.close()
+    send_json(handler, report)
+
+
+def load_analytics():
+    # NumPy is optional; only the analytics endpoints need it
+    try:
+        import analytics
+    except ImportError:
+        return None
+    return analytics
+
+
+def send_analytics(handler, build):
+    engine = load_analytics()
+    if engine is None:
+        send_json(handler, {"error": "Аналітика недоступна: не встановлено numpy"}, HTTPStatus.NOT_IMPLEMENTED)
+        return
+    try:
+        start, end = report_range(handler.query)
+    except ValueError:
+        send_json(handler, {"error": "Некоректний період"}, HTTPStatus.BAD_REQUEST)
+        return
+    lo = int(start.replace(tzinfo=timezone.utc).timestamp())
+    # order_date has whole seconds; round a fractional end up so "now" includes this second
+    hi = int(end.replace(tzinfo=timezone.utc).timestamp()) + (1 if end.microsecond else 0)
+    conn = get_db()
+    try:
+        report = build(engine, conn, lo, hi)
+    finally:
+        conn.close()
+    report['from'] = datetime.fromtimestamp(lo, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    report['to'] = datetime.fromtimestamp(hi, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    send_json(handler, report)
+
+
+def api_top_products(handler, user):
+    by = query_value(handler.query, 'by', 'revenue')
+    try:
+        limit = page_size(handler.query, 10)
+    except ValueError as exc:
+        send_json(handler, {"error": str(exc)}, HTTPStatus.BAD_REQUEST)
+        return
+    if by not in ('revenue', 'quantity'):
+        send_json(handler, {"error": "Невідоме сортування"}, HTTPStatus.BAD_REQUEST)
+        return
+    send_analytics(
+        handler,
+        lambda engine, conn, start, end: {"by": by, "products": engine.top_products(conn, start, end, limit, by)},
+    )
+
+
+def api_sales_heatmap(handler, user):
+    try:
+        utc_offset = int(query_value(handler.query, 'utc_offset', 0))
+        if not -720 <= utc_offset <= 840:
+            raise ValueError
+    except ValueError:
+        send_json(handler, {"error": "Некоректний часовий зсув"}, HTTPStatus.BAD_REQUEST)
+        return
+    send_analytics(
+        handler,
+        lambda engine, conn, start, end: dict(engine.heatmap(conn, start, end, utc_offset), utc_offset=utc_offset),
+    )
+
+
+def api_margins(handler, user):
+    send_analytics(handler, lambda engine, conn, start, end: {"products": engine.margins(conn, start, end)})
+
+
+def api_events(handler, user):
+    subscription = broker.subscribe()
+    if subscription is None:
+        send_json(handler, {"error": "Забагато підписників"}, HTTPStatus.SERVICE_UNAVAILABLE, {'Retry-After': '5'})
+        return
+    read_body(handler)
+    handler.close_connection = True
+    try:
+        handler.send_response(HTTPStatus.OK)
+        handler.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        handler.send_header('Cache-Control', 'no-cache')
+        handler.send_header('Connection', 'close')
+        handler.send_header('Access-Control-Allow-Origin', '*')
+        handler.end_headers()
+        version, local_bumps = data_version(), _local_bumps
+        handler.wfile.write(b"retry: 3000\nevent: ready\ndata: " + dump_json({"version": version}) + b"\n\n")
+        last_write = time.monotonic()
+        while True:
+            try:
+                frames = [subscription.queue.get(timeout=EVENT_POLL_INTERVAL)]
+            except queue.Empty:
+                frames = []
+            if subscription.dropped:
+                handler.wfile.write(b"event: dropped\ndata: {}\n\n")
                 return
-            body = read_json(self)
-            conn = get_db()
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO ingredients (name, current_stock, unit, warning_threshold) VALUES (?,?,?,?)",
-                (body['name'], body.get('current_stock', 0), body.get('unit', ''), body.get('warning_threshold', 0)),
-            )
-            conn.commit()
-            new_id = cur.lastrowid
-            conn.close()
-            send_json(self, {"ingredient_id": new_id})
+            while True:
+                try:
+                    frames.append(subscription.queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Writes committed by other worker processes only show up as version bumps
+            current, current_bumps = data_version(), _local_bumps
+            if current - version > current_bumps - local_bumps:
+                frames.append(b"event: resync\ndata: " + dump_json({"version": current}) + b"\n\n")
+            version, local_bumps = current, current_bumps
+            if not frames and time.monotonic() - last_write >= EVENT_HEARTBEAT:
+                frames.append(b": ping\n\n")
+            if frames:
+                handler.wfile.write(b"".join(frames))
+                last_write = time.monotonic()
+    except OSError:
+        pass
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def api_metrics(handler, user):
+    send_text(handler, metrics.render(), 'text/plain; version=0.0.4; charset=utf-8')
+
+
+def api_profile(handler, user):
+    send_text(handler, profiler.folded())
+
+
+def api_profiler(handler, user):
+    body = read_json(handler)
+    if body.get('reset'):
+        profiler.reset()
+    if body.get('enabled') is True:
+        profiler.start(body.get('interval'))
+    elif body.get('enabled') is False:
+        profiler.stop()
+    send_json(handler, {"enabled": profiler.running, "interval": profiler.interval, "samples": profiler.samples})
+
+
+ROUTES = (
+    ('POST', '/api/auth/login', api_login, PUBLIC),
+    ('GET', '/api/orders', api_list_orders, STAFF),
+    ('POST', '/api/orders', api_create_order, STAFF, {'priority': CHECKOUT}),
+    ('GET', '/api/products', api_list_products, STAFF),
+    ('POST', '/api/products', api_create_product, ADMIN),
+    ('PUT', '/api/products/{product_id:int}', api_update_product, ADMIN),
+    ('POST', '/api/products/{product_id:int}/recipes', api_update_recipes, ADMIN),
+    ('GET', '/api/ingredients', api_list_ingredients, STAFF),
+    ('POST', '/api/ingredients', api_create_ingredient, ADMIN),
+    ('PUT', '/api/ingredients/{ingredient_id:int}', api_update_ingredient, ADMIN),
+    ('POST', '/api/ingredients/{ingredient_id:int}/writeoff', api_write_off_ingredient, ADMIN),
+    ('GET', '/api/ingredients/{ingredient_id:int}/movements', api_ingredient_movements, ADMIN),
+    ('POST', '/api/ingredients/bulk', api_bulk_import, ADMIN, {'priority': BACKGROUND}),
+    ('POST', '/api/products/bulk', api_bulk_import, ADMIN, {'priority': BACKGROUND}),
+    ('POST', '/api/supplies/bulk', api_bulk_import, ADMIN, {'priority': BACKGROUND}),
+    ('POST', '/api/employees', api_create_employee, ADMIN),
+    ('GET', '/api/reports/sales', api_sales_report, ADMIN),
+    ('GET', '/api/reports/top-products', api_top_products, ADMIN),
+    ('GET', '/api/reports/heatmap', api_sales_heatmap, ADMIN),
+    ('GET', '/api/reports/margins', api_margins, ADMIN),
+    ('GET', '/api/stock/levels', api_stock_levels, ADMIN),
+    ('GET', '/api/stock/consumption', api_stock_consumption, ADMIN),
+    ('GET', '/api/stock/forecast', api_stock_forecast, ADMIN),
+    ('GET', '/api/events', api_events, STAFF, {'query_token': True, 'stream': True}),
+    ('GET', '/api/metrics', api_metrics, ADMIN),
+    ('GET', '/api/metrics/profile', api_profile, ADMIN),
+    ('POST', '/api/metrics/profiler', api_profiler, ADMIN),
+)
+
+router = Router(ROUTES)
+
+
+class AppHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    timeout = KEEPALIVE_TIMEOUT
+    request_body = None
+
+    def parse_request(self):
+        self.request_body = None
+        self.response_status = None
+        self.matched = None
+        if not super().parse_request():
+            return False
+        path, _, self.query_string = self.path.partition('?')
+        if path.startswith('/api/'):
+            self.matched = router.match(self.command, path)
+            route = self.matched[0]
+            self.route = route.pattern if route is not None else 'unmatched'
+        else:
+            self.route = 'static'
+        self.request_started = time.perf_counter()
+        metrics.begin_request(self.route)
+        return True
+
+    def send_response(self, code, message=None):
+        self.response_status = int(code)
+        super().send_response(code, message)
+
+    def log_request(self, code='-', size='-'):
+        if isinstance(code, HTTPStatus):
+            code = code.value
+        # Event streams carry the bearer token in the query string; keep it out of the access log
+        requestline = re.sub(r'([?&]token=)[^&\s]+', r'\1***', self.requestline)
+        self.log_message('"%s" %s %s', requestline, str(code), str(size))
+
+    def handle_one_request(self):
+        self.request_started = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self.request_started is not None:
+                metrics.end_request(
+                    self.command, self.route, self.response_status or 0, time.perf_counter() - self.request_started
+                )
+
+    def dispatch(self):
+        route, params, allowed = self.matched or (None, {}, None)
+        if route is None:
+            if allowed:
+                read_body(self)
+                send_json(self, {"error": "Method not allowed"}, HTTPStatus.METHOD_NOT_ALLOWED,
+                          {'Allow': ', '.join(sorted(allowed))})
+            else:
+                send_json(self, {"error": "Not found"}, HTTPStatus.NOT_FOUND)
             return
-        if self.path.startswith('/api/products/') and self.path.endswith('/recipes'):
-            if user['role'] != 'Admin':
+        self.query = parse_qs(self.query_string)
+        user = None
+        if route.role != PUBLIC:
+            # EventSource cannot send headers, so streaming routes also accept ?token=
+            user = authenticate(self, query_value(self.query, 'token') if route.query_token else None)
+            if not user:
+                send_json(self, {"error": "Unauthorized"}, HTTPStatus.UNAUTHORIZED)
+                return
+            if route.role == ADMIN and user['role'] != 'Admin':
                 send_json(self, {"error": "Доступ заборонено"}, HTTPStatus.FORBIDDEN)
                 return
-            product_id = int(self.path.split('/')[3])
-            body = read_json(self)
-            recipe_items = body.get('recipes', [])
-            conn = get_db()
-            conn.execute("DELETE FROM recipes WHERE product_id=?", (product_id,))
-            conn.executemany(
-                "INSERT INTO recipes (product_id, ingredient_id, quantity_required) VALUES (?,?,?)",
-                [(product_id, r['ingredient_id'], r['quantity_required']) for r in recipe_items],
-            )
-            conn.commit()
-            conn.close()
-            send_json(self, {"message": "Рецепт оновлено"})
+        route.handler(self, user, **params)
+
+    def translate_path(self, path):
+        # Serve frontend files for non-api routes
+        if path.startswith('/api'):
+            return super().translate_path(path)
+        path = posixpath.normpath(unquote(urlparse(path).path))
+        if path == '/':
+            path = '/index.html'
+        return os.path.join(FRONTEND_DIR, path.lstrip('/'))
+
+    def send_static(self, head_only=False):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, 'index.html')
+        try:
+            entry = static_cache.get(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+        if entry is None:
+            if head_only:
+                return super().do_HEAD()
+            return super().do_GET()
+        if not_modified(self.headers, entry):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', entry['etag'])
+            self.send_header('Last-Modified', entry['last_modified'])
+            self.send_header('Cache-Control', entry['cache_control'])
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
+        encoding = choose_encoding(self.headers.get('Accept-Encoding', ''), entry['variants'])
+        body = entry['variants'][encoding]
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', entry['content_type'])
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('ETag', entry['etag'])
+        self.send_header('Last-Modified', entry['last_modified'])
+        self.send_header('Cache-Control', entry['cache_control'])
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def send_catalog(self, key, build):
+        version = data_version()
+        etag = catalog_etag(version, key)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(self.headers.get('If-None-Match', ''), etag):
+            send_not_modified(self, headers)
             return
-        send_json(self, {"error": "Not found"}, HTTPStatus.NOT_FOUND)
+        body = catalog_cache.get(key, version)
+        if body is None:
+            body = dump_json(build())
+            catalog_cache.put(key, version, body)
+        send_json_bytes(self, body, headers=headers)
+
+    def do_HEAD(self):
+        if self.path.startswith('/api/'):
+            return super().do_HEAD()
+        self.send_static(head_only=True)
+
+    def do_OPTIONS(self):
+        read_body(self)
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Length', '0')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization, Idempotency-Key')
+        self.send_header('Access-Control-Allow-Methods', 'GET,POST,PUT,OPTIONS')
+        self.end_headers()
+
+    def do_POST(self):
+        self.dispatch()
 
     def do_PUT(self):
-        user = authenticate(self)
-        if not user:
-            send_json(self, {"error": "Unauthorized"}, HTTPStatus.UNAUTHORIZED)
+        self.dispatch()
+
+    def do_GET(self):
+        if self.matched is not None:
+            self.dispatch()
             return
-        if self.path.startswith('/api/ingredients/'):
-            if user['role'] != 'Admin':
-                send_json(self, {"error": "Доступ заборонено"}, HTTPStatus.FORBIDDEN)
-                return
-            ing_id = int(self.path.split('/')[-1])
-            body = read_json(self)
-            conn = get_db()
-            conn.execute(
-                "UPDATE ingredients SET name=?, current_stock=?, unit=?, warning_threshold=? WHERE ingredient_id=?",
-                (
-                    body.get('name'),
-                    body.get('current_stock', 0),
-                    body.get('unit', ''),
-                    body.get('warning_threshold', 0),
-                    ing_id,
-                ),
-            )
-            conn.commit()
-            conn.close()
-            send_json(self, {"message": "Інгредієнт оновлено"})
+        self.send_static()
+
+
+class LoopWriter:
+    """File-like wfile for worker threads that writes through the event loop."""
+
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+
+    async def _write(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def write(self, data):
+        if data:
+            asyncio.run_coroutine_threadsafe(self._write(bytes(data)), self.loop).result()
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def content_length(head):
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length':
+            try:
+                return max(int(value.strip()), 0)
+            except ValueError:
+                return 0
+    return 0
+
+
+async def serve_async_connection(reader, writer, executor):
+    loop = asyncio.get_running_loop()
+    handler = AppHandler.__new__(AppHandler)
+    handler.client_address = (writer.get_extra_info('peername') or ('', 0))[:2]
+    handler.server = None
+    handler.request = None
+    handler.directory = FRONTEND_DIR
+    handler.wfile = LoopWriter(loop, writer)
+    handler.handle_expect_100 = lambda: True
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                break
+            if b'\r\nexpect: 100-continue' in head.lower():
+                writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            length = content_length(head)
+            body = await reader.readexactly(length) if length else b''
+            handler.rfile = io.BytesIO(head + body)
+            await loop.run_in_executor(executor, handler.handle_one_request)
+            if handler.close_connection:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+def drain_requests(timeout=GRACEFUL_TIMEOUT):
+    broker.close_all()
+    deadline = time.monotonic() + timeout
+    while metrics.active and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def serve_asyncio(host, port, workers=ASYNC_WORKERS, reuse_port=False):
+    # Each event stream holds a worker for its lifetime; keep most of the pool for requests
+    broker.max_clients = min(broker.max_clients, max(workers // 4, 1))
+
+    async def main():
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="app")
+        server = await asyncio.start_server(
+            lambda reader, writer: serve_async_connection(reader, writer, executor), host, port,
+            reuse_port=reuse_port or None,
+        )
+        if not reuse_port:
+            print(f'Server running on http://{host}:{port} (asyncio, {workers} workers)')
+            async with server:
+                await server.serve_forever()
             return
-        if self.path.startswith('/api/products/'):
-            if user['role'] != 'Admin':
-                send_json(self, {"error": "Доступ заборонено"}, HTTPStatus.FORBIDDEN)
+        stopping = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+        await stopping.wait()
+        server.close()
+        await asyncio.get_running_loop().run_in_executor(None, drain_requests)
+
+    asyncio.run(main())
+
+
+def serve_threading(host, port, reuse_port=False):
+    server = ThreadingHTTPServer((host, port), AppHandler, bind_and_activate=False)
+    try:
+        if reuse_port:
+            server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        server.server_bind()
+        server.server_activate()
+    except OSError:
+        server.server_close()
+        raise
+    if not reuse_port:
+        print(f'Server running on http://{host}:{port}')
+        server.serve_forever()
+        return
+    # shutdown() waits for serve_forever() to return, so it cannot run in the signal handler's thread
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    server.serve_forever()
+    server.server_close()
+    drain_requests()
+
+
+class RequestQueue:
+    """Per-priority FIFO queues under one bound; lower-priority classes get a smaller share of it."""
+
+    def __init__(self, limit, levels=len(PRIORITY_NAMES)):
+        self.limit = limit
+        self.queues = [deque() for _ in range(levels)]
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.checkout_ready = threading.Condition(self.lock)
+        self.closed = False
+
+    def depths(self):
+        return [len(pending) for pending in self.queues]
+
+    def put(self, priority, item):
+        with self.lock:
+            levels = len(self.queues)
+            if self.closed or sum(self.depths()) >= self.limit * (levels - priority) / levels:
+                return False
+            self.queues[priority].append((time.monotonic(), item))
+            if priority == CHECKOUT:
+                self.checkout_ready.notify()
+            self.ready.notify()
+        return True
+
+    def get(self, checkout_only=False):
+        """Oldest item of the most urgent non-empty class, or None once closed and drained."""
+        waiting = self.checkout_ready if checkout_only else self.ready
+        with self.lock:
+            while True:
+                for priority, pending in enumerate(self.queues[:1] if checkout_only else self.queues):
+                    if pending:
+                        queued_at, item = pending.popleft()
+                        return priority, queued_at, item
+                if self.closed:
+                    return None
+                waiting.wait()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.ready.notify_all()
+            self.checkout_ready.notify_all()
+
+
+request_queue = None
+
+
+class SocketWriter:
+    """Unbuffered wfile for a pooled connection."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def write(self, data):
+        self.sock.sendall(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class PoolConnection:
+    __slots__ = ('sock', 'address', 'buffer', 'last_active', 'continued', 'handler')
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address[:2]
+        self.buffer = bytearray()
+        self.last_active = time.monotonic()
+        self.continued = False
+        self.handler = None
+
+    def oversized(self):
+        """Status to refuse the buffered request with, judged from its head before the body is read."""
+        head_end = self.buffer.find(b'\r\n\r\n')
+        if head_end < 0:
+            return HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE if len(self.buffer) > MAX_REQUEST_HEAD else None
+        if head_end + 4 > MAX_REQUEST_HEAD:
+            return HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE
+        if content_length(bytes(self.buffer[:head_end + 4])) > MAX_REQUEST_BODY:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        return None
+
+    def take_request(self):
+        """Split one complete request (head and body) off the buffer, or None if it has not all arrived."""
+        head_end = self.buffer.find(b'\r\n\r\n')
+        if head_end < 0:
+            return None
+        head = bytes(self.buffer[:head_end + 4])
+        total = len(head) + content_length(head)
+        if len(self.buffer) < total:
+            if not self.continued and b'\r\nexpect: 100-continue' in head.lower():
+                self.continued = True
+                try:
+                    self.sock.send(b'HTTP/1.1 100 Continue\r\n\r\n')
+                except OSError:
+                    pass
+            return None
+        request = bytes(self.buffer[:total])
+        del self.buffer[:total]
+        self.continued = False
+        return request
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def request_priority(request):
+    parts = request[:request.find(b'\r\n')].split()
+    method = parts[0].decode('latin-1') if parts else ''
+    path = parts[1].decode('latin-1').partition('?')[0] if len(parts) > 1 else ''
+    route = router.match(method, path)[0] if path.startswith('/api/') else None
+    if route is None:
+        return INTERACTIVE, False
+    return route.priority, route.stream
+
+
+class PoolServer:
+    """Fixed worker pool fed by a single selector thread.
+
+    The selector owns every idle keep-alive connection and reads each request in full
+    before queueing it by priority, so slow or idle clients never hold a worker. A request
+    that finds its class over quota is answered 503 with Retry-After at once, and
+    non-checkout requests that waited past APP_POOL_QUEUE_TIMEOUT are shed the same way.
+    Heads over APP_MAX_REQUEST_HEAD get 431 and declared bodies over APP_MAX_REQUEST_BODY
+    get 413 before they are buffered. Event streams run on their own threads, capped at the broker's client limit.
+    """
+
+    def __init__(self, host, port, workers=POOL_WORKERS, reserved=POOL_RESERVED_WORKERS,
+                 queue_limit=POOL_QUEUE_LIMIT, reuse_port=False):
+        self.listener = socket.create_server((host, port), backlog=1024, reuse_port=reuse_port)
+        self.listener.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.wakeup, self.waker = socket.socketpair()
+        self.wakeup.setblocking(False)
+        self.waker.setblocking(False)
+        self.selector.register(self.wakeup, selectors.EVENT_READ)
+        self.returned = deque()
+        self.requests = RequestQueue(queue_limit)
+        self.streams = threading.BoundedSemaphore(broker.max_clients)
+        self.running = True
+        # The reserved workers only ever take checkouts, so a pool full of reports cannot stall a sale
+        reserved = min(reserved, workers - 1)
+        self.workers = [
+            threading.Thread(target=self.work, args=(index < reserved,), name=f"pool-{index}", daemon=True)
+            for index in range(workers)
+        ]
+
+    def serve_forever(self):
+        for thread in self.workers:
+            thread.start()
+        last_sweep = time.monotonic()
+        try:
+            while self.running:
+                for key, _ in self.selector.select(timeout=1.0):
+                    if key.fileobj is self.listener:
+                        self.accept()
+                    elif key.fileobj is self.wakeup:
+                        self.take_back()
+                    else:
+                        self.receive(key.data)
+                now = time.monotonic()
+                if now - last_sweep >= 1.0:
+                    self.close_idle(now)
+                    last_sweep = now
+        finally:
+            self.selector.unregister(self.listener)
+            self.listener.close()
+            for key in list(self.selector.get_map().values()):
+                if isinstance(key.data, PoolConnection):
+                    self.selector.unregister(key.fileobj)
+                    key.data.close()
+            self.requests.close()
+            deadline = time.monotonic() + GRACEFUL_TIMEOUT
+            for thread in self.workers:
+                thread.join(max(deadline - time.monotonic(), 0))
+
+    def shutdown(self):
+        self.running = False
+        self.wake()
+
+    def wake(self):
+        try:
+            self.waker.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def accept(self):
+        while True:
+            try:
+                sock, address = self.listener.accept()
+            except (BlockingIOError, InterruptedError):
                 return
-            product_id = int(self.path.split('/')[-1])
-            body = read_json(self)
-            conn = get_db()
-            conn.execute(
-                "UPDATE products SET category_id=?, name=?, description=?, price=?, is_active=? WHERE product_id=?",
-                (
-                    body.get('category_id'),
-                    body.get('name'),
-                    body.get('description', ''),
-                    body.get('price'),
-                    1 if body.get('is_active', True) else 0,
-                    product_id,
-                ),
-            )
-            conn.commit()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ, PoolConnection(sock, address))
+
+    def receive(self, conn):
+        try:
+            data = conn.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.selector.unregister(conn.sock)
             conn.close()
-            send_json(self, {"message": "Продукт оновлено"})
             return
-        send_json(self, {"error": "Not found"}, HTTPStatus.NOT_FOUND)
+        conn.buffer += data
+        conn.last_active = time.monotonic()
+        status = conn.oversized()
+        request = None if status is not None else conn.take_request()
+        if status is None and request is None:
+            return
+        self.selector.unregister(conn.sock)
+        if status is not None:
+            self.reject(conn, status)
+        else:
+            self.schedule(conn, request)
 
-    def do_GET(self):
-        if self.path.startswith('/api/'):
-            user = authenticate(self)
-            if not user and not self.path.startswith('/api/auth/login'):
-                send_json(self, {"error": "Unauthorized"}, HTTPStatus.UNAUTHORIZED)
-                return
-            if self.path.startswith('/api/products'):
-                query = parse_qs(urlparse(self.path).query)
-                category_id = query.get('category_id', [None])[0]
-                products = get_products(int(category_id) if category_id else None)
-                send_json(self, products)
-                return
-            if self.path == '/api/ingredients':
-                conn = get_db()
-                data = conn.execute("SELECT * FROM ingredients").fetchall()
+    def take_back(self):
+        try:
+            while self.wakeup.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+        while self.returned:
+            conn = self.returned.popleft()
+            if not self.running:
                 conn.close()
-                send_json(self, data)
-                return
-            if self.path.startswith('/api/reports/sales'):
-                if user['role'] != 'Admin':
-                    send_json(self, {"error": "Доступ заборонено"}, HTTPStatus.FORBIDDEN)
-                    return
-                query = parse_qs(urlparse(self.path).query)
-                period = query.get('period', ['day'])[0]
-                conn = get_db()
-                cur = conn.cursor()
-                cur.execute(
-                    "SELECT SUM(total_amount) as total, COUNT(*) as count FROM orders WHERE order_date >= CASE ? WHEN 'day' THEN datetime('now','-1 day') WHEN 'week' THEN datetime('now','-7 day') ELSE datetime('now','-1 month') END",
-                    (period,),
-                )
-                row = cur.fetchone()
+                continue
+            # A pipelined request may already be buffered; it will not make the socket readable again
+            status = conn.oversized()
+            if status is not None:
+                self.reject(conn, status)
+                continue
+            request = conn.take_request()
+            if request is None:
+                self.selector.register(conn.sock, selectors.EVENT_READ, conn)
+            else:
+                self.schedule(conn, request)
+
+    def close_idle(self, now):
+        for key in list(self.selector.get_map().values()):
+            conn = key.data
+            if isinstance(conn, PoolConnection) and now - conn.last_active > KEEPALIVE_TIMEOUT:
+                self.selector.unregister(conn.sock)
                 conn.close()
-                send_json(self, row)
-                return
-            send_json(self, {"error": "Not found"}, HTTPStatus.NOT_FOUND)
+
+    def schedule(self, conn, request):
+        priority, stream = request_priority(request)
+        if stream:
+            if self.streams.acquire(blocking=False):
+                threading.Thread(target=self.stream, args=(conn, request), name="pool-stream", daemon=True).start()
+            else:
+                metrics.record_shed(priority)
+                self.reject(conn)
             return
-        return super().do_GET()
+        if not self.requests.put(priority, (conn, request)):
+            metrics.record_shed(priority)
+            self.reject(conn)
+
+    def reject(self, conn, status=HTTPStatus.SERVICE_UNAVAILABLE):
+        overloaded = status == HTTPStatus.SERVICE_UNAVAILABLE
+        body = dump_json({"error": "Сервер перевантажено, спробуйте пізніше" if overloaded else "Запит завеликий"})
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            + (f"Retry-After: {POOL_RETRY_AFTER}\r\n" if overloaded else "")
+            + "Connection: close\r\n\r\n"
+        )
+        try:
+            conn.sock.send(head.encode() + body)
+        except OSError:
+            pass
+        conn.close()
+
+    def work(self, checkout_only):
+        while True:
+            item = self.requests.get(checkout_only)
+            if item is None:
+                return
+            priority, queued_at, (conn, request) = item
+            if priority != CHECKOUT and time.monotonic() - queued_at > POOL_QUEUE_TIMEOUT:
+                metrics.record_shed(priority)
+                self.reject(conn)
+                continue
+            if self.handle(conn, request) and self.running:
+                conn.last_active = time.monotonic()
+                self.returned.append(conn)
+                self.wake()
+            else:
+                conn.close()
+
+    def stream(self, conn, request):
+        try:
+            self.handle(conn, request)
+        finally:
+            conn.close()
+            self.streams.release()
+
+    def handle(self, conn, request):
+        """Run one request on a worker thread; True if the connection stays open."""
+        handler = conn.handler
+        if handler is None:
+            handler = conn.handler = AppHandler.__new__(AppHandler)
+            handler.client_address = conn.address
+            handler.server = None
+            handler.request = conn.sock
+            handler.directory = FRONTEND_DIR
+            handler.wfile = SocketWriter(conn.sock)
+            handler.handle_expect_100 = lambda: True
+        handler.rfile = io.BytesIO(request)
+        handler.close_connection = True
+        conn.sock.settimeout(KEEPALIVE_TIMEOUT)
+        try:
+            handler.handle_one_request()
+        except OSError:
+            return False
+        except Exception:
+            traceback.print_exc()
+            return False
+        if handler.close_connection:
+            return False
+        conn.sock.setblocking(False)
+        return True
+
+
+def serve_pool(host, port, workers=POOL_WORKERS, reuse_port=False):
+    global request_queue
+    server = PoolServer(host, port, workers, reuse_port=reuse_port)
+    request_queue = server.requests
+    if not reuse_port:
+        print(f'Server running on http://{host}:{port} (pool, {workers} workers)')
+        server.serve_forever()
+        return
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+    server.serve_forever()
+    drain_requests()
+
+
+def _after_fork_in_child():
+    global _auth_executor, _auth_lock
+    # Threads and SQLite handles do not survive fork(); let the worker create its own lazily
+    _auth_executor = None
+    _auth_lock = threading.Lock()
+    _pool.clear()
+    if order_writer is not None:
+        order_writer.thread = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def run_worker(slot, host, port, server):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if os.environ.get('APP_PROFILER') == '1':
+        profiler.start()
+    if slot == 0:
+        run_snapshots()
+    print(f'Worker {slot} started (pid {os.getpid()})')
+    if server == 'asyncio':
+        serve_asyncio(host, port, reuse_port=True)
+    elif server == 'pool':
+        serve_pool(host, port, reuse_port=True)
+    else:
+        serve_threading(host, port, reuse_port=True)
+
+
+def serve_prefork(host, port, workers, server='threading'):
+    """Fork workers that each accept on their own SO_REUSEPORT socket and keep them running.
+
+    SIGTERM/SIGINT stop the workers gracefully; SIGHUP replaces them one by one.
+    """
+    if not hasattr(os, 'fork') or not hasattr(socket, 'SO_REUSEPORT'):
+        raise SystemExit("--workers needs fork() and SO_REUSEPORT")
+    close_db_pool()
+    share_data_version()
+    children = {}
+    retiring = set()
+    requested = []
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(slot, host, port, server)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = (slot, time.monotonic())
+
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, lambda signum, frame: requested.append(signum))
+    for slot in range(workers):
+        spawn(slot)
+    print(f'Server running on http://{host}:{port} ({server}, {workers} worker processes)')
+    stopping = False
+    while children:
+        while requested:
+            signum = requested.pop(0)
+            if signum == signal.SIGHUP and not stopping:
+                for pid, (slot, _) in list(children.items()):
+                    if pid not in retiring:
+                        retiring.add(pid)
+                        spawn(slot)
+                        os.kill(pid, signal.SIGTERM)
+            elif signum != signal.SIGHUP and not stopping:
+                stopping = True
+                for pid in children:
+                    os.kill(pid, signal.SIGTERM)
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        slot, started = children.pop(pid, (None, 0))
+        if slot is None or pid in retiring:
+            retiring.discard(pid)
+            continue
+        if not stopping:
+            print(f'Worker {slot} (pid {pid}) exited with status {status}, restarting', file=sys.stderr)
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            spawn(slot)
+
+
+# Plans are checked on the very SQL the request paths run, built with a representative shape
+HOT_QUERIES = (
+    ('login', EMPLOYEE_BY_PHONE_SQL, ('+380991234567',)),
+    ('products by category', *products_query(1)),
+    ('availability by category', *availability_query(1)),
+    ('order prices', PRODUCT_PRICES_SQL.format(placeholders="?,?"), (1, 2)),
+    ('ingredient demand', RECIPE_DEMAND_SQL.format(placeholders="?,?"), (1, 2)),
+    ('stock shortages', SHORTAGES_SQL.format(rows="(?,?),(?,?)"), (1, 0.02, 3, 0.25)),
+    ('affected products', AFFECTED_PRODUCTS_SQL.format(placeholders="?,?"), (1, 3)),
+    ('recipe replace', DELETE_RECIPES_SQL, (1,)),
+    ('orders page', *orders_page_query('main', {})),
+    ('orders by employee', *orders_page_query('main', {'employee_id': 2})),
+    ('archived orders by date', *orders_page_query('archive', {'from': '2024-01-01', 'to': '2024-02-01'})),
+    ('order items', ORDER_ITEMS_SQL.format(placeholders="?,?"), (1, 2)),
+    ('stock movements', MOVEMENTS_SQL, (1, 0, 101)),
+    ('stock at time', *ledger_totals_query(datetime(2024, 1, 1), 1)),
+    ('idempotency key', IDEMPOTENCY_LOOKUP_SQL, (1, 'key', 0)),
+)
+
+
+def full_scans(conn, sql, params):
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    details = [row['detail'] for row in plan]
+    # Views and subqueries are scanned as co-routines over rows that were already found by index,
+    # and VALUES lists show up as constant rows
+    derived = {detail.split(' ', 1)[1] for detail in details if detail.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+    # "SCAN t USING INDEX ..." walks an index in order under a LIMIT; a bare "SCAN t" reads the whole table
+    return [
+        detail for detail in details
+        if detail.startswith('SCAN ') and ' INDEX ' not in detail and detail[5:] not in derived
+        and 'CONSTANT ROW' not in detail
+    ], plan
+
+
+def check_db(started):
+    """Print migration time and the query plan of every hot query; exit non-zero if any scans a table."""
+    conn = get_db()
+    version = conn.execute("PRAGMA user_version").fetchone()['user_version']
+    print(f"Schema version {version}/{len(MIGRATIONS)}, ready in {(time.perf_counter() - started) * 1000:.1f} ms")
+    failed = 0
+    for name, sql, params in HOT_QUERIES:
+        scans, plan = full_scans(conn, sql, params)
+        failed += bool(scans)
+        print(f"{'SCAN' if scans else 'ok':<5} {name}")
+        for row in plan:
+            print(f"        {row['detail']}")
+    conn.close()
+    raise SystemExit(1 if failed else 0)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Coffee shop POS server")
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '8000')))
+    parser.add_argument('--server', choices=('threading', 'asyncio', 'pool'), default='threading',
+                        help="thread-per-connection server, asyncio event loop with a worker pool, "
+                             "or a fixed prioritised worker pool that sheds load with 503")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="number of forked worker processes sharing the port via SO_REUSEPORT")
+    parser.add_argument('--rebuild-rollups', action='store_true', help="rebuild sales rollups from orders and exit")
+    parser.add_argument('--check-db', action='store_true',
+                        help="migrate the database, print the query plan of each hot query and exit")
+    parser.add_argument('--create-admin', metavar='PHONE',
+                        help="create an admin account and exit; the password comes from APP_ADMIN_PASSWORD "
+                             "or is prompted for")
+    parser.add_argument('--admin-name', default="Адміністратор", help="name for --create-admin")
+    parser.add_argument('--archive-orders', action='store_true',
+                        help="move orders older than --archive-after-days into the archive database and exit")
+    parser.add_argument('--archive-after-days', type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--vacuum', action='store_true', help="with --archive-orders, compact the hot database afterwards")
+    parser.add_argument('--order-writer', action='store_true', default=ORDER_WRITER,
+                        help="group-commit checkouts through a single writer thread")
+    parser.add_argument('--order-batch-size', type=int, default=ORDER_BATCH_SIZE, help="max orders per group commit")
+    parser.add_argument('--order-batch-window-ms', type=float, default=ORDER_BATCH_WINDOW * 1000,
+                        help="how long the writer waits for more orders before committing")
+    args = parser.parse_args()
+    started = time.perf_counter()
     ensure_db()
-    server = ThreadingHTTPServer(('0.0.0.0', 8000), AppHandler)
-    print('Server running on http://0.0.0.0:8000')
-    server.serve_forever()
+    if args.check_db:
+        check_db(started)
+    if args.create_admin:
+        password = os.environ.get('APP_ADMIN_PASSWORD') or getpass.getpass('Admin password: ')
+        if not password:
+            raise SystemExit('Password must not be empty')
+        conn = get_db()
+        if conn.execute("SELECT 1 FROM employees WHERE phone=?", (args.create_admin,)).fetchone():
+            raise SystemExit(f'Phone {args.create_admin} is already in use')
+        employee_id = create_employee(conn, args.admin_name, 'Admin', args.create_admin, password)
+        conn.close()
+        print(f'Admin {employee_id} created for {args.create_admin}')
+        raise SystemExit(0)
+    if args.order_writer:
+        order_writer = OrderWriter(args.order_batch_size, args.order_batch_window_ms / 1000)
+    if args.rebuild_rollups:
+        conn = get_db()
+        rebuild_sales_rollups(conn)
+        conn.close()
+        print('Sales rollups rebuilt')
+        raise SystemExit(0)
+    if args.archive_orders:
+        conn = get_db()
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=args.archive_after_days)
+        moved = archive_orders(conn, cutoff)
+        if args.vacuum:
+            conn.execute("VACUUM main")
+        conn.execute("PRAGMA main.wal_checkpoint(TRUNCATE)")
+        conn.close()
+        print(f'Archived {moved} orders placed before {cutoff:%Y-%m-%d %H:%M:%S} to {archive_path()}')
+        raise SystemExit(0)
+    if args.workers > 1:
+        serve_prefork(args.host, args.port, args.workers, args.server)
+    else:
+        if os.environ.get('APP_PROFILER') == '1':
+            profiler.start()
+        run_snapshots()
+        if args.server == 'asyncio':
+            serve_asyncio(args.host, args.port)
+        elif args.server == 'pool':
+            serve_pool(args.host, args.port)
+        else:
+            serve_threading(args.host, args.port)
@@ -0,0 +1,121 @@
+"""Benchmark the NumPy analytics reports over a year of synthetic orders against plain SQL.
+
+Requires numpy. Usage: python benchmarks/bench_analytics.py [--orders-per-day 200] [--days 365] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import analytics  # noqa: E402
+
+
+def populate(orders_per_day, days):
+    conn = app.get_db()
+    product_ids = [row['product_id'] for row in conn.execute("SELECT product_id FROM products")]
+    prices = {row['product_id']: row['price'] for row in conn.execute("SELECT product_id, price FROM products")}
+    rnd = random.Random(days)
+    start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    next_id = conn.execute("SELECT COALESCE(MAX(order_id), 0) + 1 AS n FROM orders").fetchone()['n']
+    orders = []
+    details = []
+    for day in range(days):
+        for _ in range(orders_per_day):
+            moment = start + timedelta(days=day, seconds=rnd.randint(7 * 3600, 21 * 3600))
+            lines = [(rnd.choice(product_ids), rnd.randint(1, 3)) for _ in range(rnd.randint(1, 4))]
+            total = sum(prices[p] * q for p, q in lines)
+            orders.append((next_id, 2, moment.strftime('%Y-%m-%d %H:%M:%S'), total, 'Card', 'Paid'))
+            details += [(next_id, p, q, prices[p]) for p, q in lines]
+            next_id += 1
+    conn.executemany(
+        "INSERT INTO orders (order_id, employee_id, order_date, total_amount, payment_method, status) "
+        "VALUES (?,?,?,?,?,?)",
+        orders,
+    )
+    conn.executemany(
+        "INSERT INTO order_details (order_id, product_id, quantity, price_at_sale) VALUES (?,?,?,?)", details
+    )
+    conn.commit()
+    conn.close()
+    return len(orders), len(details)
+
+
+def sql_top_products(conn, start, end):
+    return conn.execute(
+        "SELECT d.product_id, SUM(d.quantity) AS quantity, SUM(d.quantity * d.price_at_sale) AS revenue "
+        "FROM order_details d JOIN orders o ON o.order_id = d.order_id "
+        "WHERE o.order_date >= ? AND o.order_date < ? GROUP BY d.product_id ORDER BY revenue DESC LIMIT 10",
+        (start, end),
+    ).fetchall()
+
+
+def sql_heatmap(conn, start, end):
+    return conn.execute(
+        "SELECT strftime('%w', o.order_date) AS weekday, strftime('%H', o.order_date) AS hour, "
+        "COUNT(DISTINCT o.order_id) AS orders, SUM(d.quantity * d.price_at_sale) AS revenue "
+        "FROM order_details d JOIN orders o ON o.order_id = d.order_id "
+        "WHERE o.order_date >= ? AND o.order_date < ? GROUP BY 1, 2",
+        (start, end),
+    ).fetchall()
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders-per-day', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.DB_PATH = os.path.join(tmp, 'bench.sqlite')
+        app.ensure_db()
+        orders, lines = populate(args.orders_per_day, args.days)
+        print(f"{orders} orders, {lines} order lines over {args.days} days")
+        end = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=1)
+        begin = end - timedelta(days=args.days + 1)
+        start_ts = int(begin.replace(tzinfo=timezone.utc).timestamp())
+        end_ts = int(end.replace(tzinfo=timezone.utc).timestamp())
+        start_text, end_text = begin.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S')
+        conn = app.get_db()
+        cold = timed(lambda: analytics.sales.refresh(conn), 1)
+        print(f"{'cold column load':<28} {cold:>9.1f} ms")
+        conn.close()
+
+        def new_orders():
+            conn = app.get_db()
+            for _ in range(100):
+                app.checkout(conn, 2, [{'product_id': 7, 'quantity': 1}])
+            conn.close()
+
+        new_orders()
+        conn = app.get_db()
+        print(f"{'refresh after 100 orders':<28} {timed(lambda: analytics.sales.refresh(conn), 1):>9.1f} ms")
+        print(f"{'report':<28} {'numpy ms':>9} {'sql ms':>9}")
+        cases = (
+            ('top products', lambda: analytics.top_products(conn, start_ts, end_ts),
+             lambda: sql_top_products(conn, start_text, end_text)),
+            ('heatmap', lambda: analytics.heatmap(conn, start_ts, end_ts, 120),
+             lambda: sql_heatmap(conn, start_text, end_text)),
+            ('margins', lambda: analytics.margins(conn, start_ts, end_ts), None),
+        )
+        for name, vectorised, sql in cases:
+            sql_ms = f"{timed(sql, args.repeat):>9.1f}" if sql else f"{'-':>9}"
+            print(f"{name:<28} {timed(vectorised, args.repeat):>9.1f} {sql_ms}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Microbenchmark of authentication overhead per request and login throughput.
+
+Usage: python benchmarks/bench_auth.py [--requests 20000] [--logins 24] [--concurrency 12]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+class FakeHandler:
+    def __init__(self, token):
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+
+def per_request_overhead(token, requests):
+    handler = FakeHandler(token)
+    results = {}
+    app.token_cache.clear()
+    start = time.perf_counter()
+    for _ in range(requests):
+        app.verify_token(token)
+    results['verify_token_us'] = (time.perf_counter() - start) / requests * 1e6
+    app.authenticate(handler)
+    start = time.perf_counter()
+    for _ in range(requests):
+        app.authenticate(handler)
+    results['authenticate_cached_us'] = (time.perf_counter() - start) / requests * 1e6
+    return results
+
+
+def login_storm(logins, concurrency):
+    pending = list(range(logins))
+    lock = threading.Lock()
+    latencies = []
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                pending.pop()
+            start = time.perf_counter()
+            data, error = app.handle_login({'phone': '+380997654321', 'password': 'barista123'})
+            assert error is None, error
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'logins_per_s': logins / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'max_ms': latencies[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--logins', type=int, default=24)
+    parser.add_argument('--concurrency', type=int, default=12)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.DB_PATH = os.path.join(tmp, 'bench.sqlite')
+        app.ensure_db()
+        data, _ = app.handle_login({'phone': '+380991234567', 'password': 'admin123'})
+        overhead = per_request_overhead(data['token'], args.requests)
+        print(f"verify_token per request:        {overhead['verify_token_us']:8.2f} us")
+        print(f"authenticate (cached) per request: {overhead['authenticate_cached_us']:6.2f} us")
+        storm = login_storm(args.logins, args.concurrency)
+        print(
+            f"login storm ({args.logins} logins, {args.concurrency} threads, {app.AUTH_WORKERS} hash workers): "
+            f"{storm['logins_per_s']:.1f}/s, p50 {storm['p50_ms']:.0f} ms, max {storm['max_ms']:.0f} ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
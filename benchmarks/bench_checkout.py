@@ -0,0 +1,107 @@
+"""Benchmark checkout throughput: one transaction per order vs the group-commit order writer.
+
+Usage: python benchmarks/bench_checkout.py [--tills 8] [--orders 200] [--batches 8,32] [--window-ms 2]
+                                           [--synchronous FULL]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+def populate():
+    conn = app.get_db()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO ingredients (name, current_stock, unit, warning_threshold) VALUES (?,?,?,?)",
+        ("Bench beans", 1e9, 'g', 0),
+    )
+    ingredient_id = cur.lastrowid
+    cur.execute(
+        "INSERT INTO products (category_id, name, description, price, is_active) VALUES (?,?,?,?,1)",
+        (1, "Bench espresso", "", 40.0),
+    )
+    product_id = cur.lastrowid
+    cur.execute(
+        "INSERT INTO recipes (product_id, ingredient_id, quantity_required) VALUES (?,?,?)",
+        (product_id, ingredient_id, 18),
+    )
+    conn.commit()
+    conn.close()
+    return product_id
+
+
+def run(tills, orders, product_id):
+    errors = []
+    latencies = []
+    lock = threading.Lock()
+
+    def till():
+        for _ in range(orders):
+            start = time.perf_counter()
+            try:
+                app.submit_checkout(1, [{'product_id': product_id, 'quantity': 1}], 'Card')
+            except Exception as exc:
+                with lock:
+                    errors.append(type(exc).__name__)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=till) for _ in range(tills)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'orders_per_s': len(latencies) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tills', type=int, default=8)
+    parser.add_argument('--orders', type=int, default=200, help="orders per till")
+    parser.add_argument('--batches', default='8,32', help="comma-separated writer batch sizes")
+    parser.add_argument('--window-ms', type=float, default=2.0)
+    parser.add_argument('--synchronous', default=app.DB_SYNCHRONOUS, help="PRAGMA synchronous for the run")
+    args = parser.parse_args()
+    app.DB_SYNCHRONOUS = args.synchronous
+
+    modes = [('per-order transaction', None)]
+    for size in (int(value) for value in args.batches.split(',')):
+        modes.append((f'writer batch={size} window={args.window_ms:g}ms', size))
+
+    print(f"{args.tills} tills x {args.orders} orders, synchronous={args.synchronous}")
+    print(f"{'mode':<34} {'orders/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'avg batch':>10}")
+    for name, size in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            app.close_db_pool()
+            app.DB_PATH = os.path.join(tmp, 'bench.sqlite')
+            app.ensure_db()
+            product_id = populate()
+            app.order_writer = app.OrderWriter(size, args.window_ms / 1000) if size else None
+            result = run(args.tills, args.orders, product_id)
+            writer = app.order_writer
+            avg_batch = f"{writer.orders / writer.batches:.1f}" if writer and writer.batches else '-'
+            print(
+                f"{name:<34} {result['orders_per_s']:>9.0f} {result['p50_ms']:>8.2f} "
+                f"{result['p99_ms']:>8.2f} {result['errors']:>7} {avg_batch:>10}"
+            )
+            app.close_db_pool()
+
+
+if __name__ == '__main__':
+    main()
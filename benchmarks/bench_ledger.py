@@ -0,0 +1,115 @@
+"""Benchmark "stock at time T" and consumption queries: snapshot + replay vs a full ledger scan.
+
+Usage: python benchmarks/bench_ledger.py [--days 180] [--movements-per-day 2000] [--snapshot-hours 1] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+def populate(days, per_day, snapshot_hours):
+    """Synthetic history ending now, with snapshots every snapshot_hours like the background job takes."""
+    conn = app.get_db()
+    ingredient_ids = [row['ingredient_id'] for row in conn.execute("SELECT ingredient_id FROM ingredients")]
+    conn.execute("DELETE FROM stock_snapshots")
+    rnd = random.Random(days)
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    start = now - timedelta(days=days)
+    stock = {ingredient_id: 0.0 for ingredient_id in ingredient_ids}
+    sold = dict.fromkeys(ingredient_ids, 0.0)
+    movements = []
+    snapshots = []
+    movement_id = 0
+    step = timedelta(hours=snapshot_hours)
+    moment = start
+    per_step = int(per_day * snapshot_hours / 24)
+    while moment < now:
+        for offset in sorted(rnd.uniform(0, step.total_seconds()) for _ in range(per_step)):
+            ingredient_id = rnd.choice(ingredient_ids)
+            if rnd.random() < 0.05:
+                kind, delta = 'supply', rnd.uniform(50, 100)
+            else:
+                kind, delta = 'sale', -rnd.uniform(0.01, 1)
+                sold[ingredient_id] -= delta
+            stock[ingredient_id] += delta
+            movement_id += 1
+            created = (moment + timedelta(seconds=offset)).strftime(app.LEDGER_TIME_FORMAT)
+            movements.append((movement_id, ingredient_id, kind, delta, created))
+        moment += step
+        taken = moment.strftime(app.LEDGER_TIME_FORMAT)
+        snapshots += [(i, taken, movement_id, stock[i], sold[i]) for i in ingredient_ids]
+    conn.executemany(
+        "INSERT INTO stock_movements (movement_id, ingredient_id, kind, quantity, created_at) VALUES (?,?,?,?,?)",
+        movements,
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO stock_snapshots (ingredient_id, taken_at, last_movement_id, stock, sold) "
+        "VALUES (?,?,?,?,?)",
+        snapshots,
+    )
+    conn.commit()
+    conn.close()
+    return len(movements), len(snapshots), start, now
+
+
+def full_scan_stock(conn, at):
+    return conn.execute(
+        "SELECT ingredient_id, SUM(quantity) FROM stock_movements WHERE created_at <= ? GROUP BY ingredient_id",
+        (at.strftime(app.LEDGER_TIME_FORMAT),),
+    ).fetchall()
+
+
+def full_scan_consumption(conn, start, end):
+    return conn.execute(
+        "SELECT ingredient_id, -SUM(quantity) FROM stock_movements "
+        "WHERE kind = 'sale' AND created_at > ? AND created_at <= ? GROUP BY ingredient_id",
+        (start.strftime(app.LEDGER_TIME_FORMAT), end.strftime(app.LEDGER_TIME_FORMAT)),
+    ).fetchall()
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--movements-per-day', type=int, default=2000)
+    parser.add_argument('--snapshot-hours', type=float, default=1)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.DB_PATH = os.path.join(tmp, 'bench.sqlite')
+        app.ensure_db()
+        movements, snapshots, start, now = populate(args.days, args.movements_per_day, args.snapshot_hours)
+        print(f"{movements} movements, {snapshots} snapshots over {args.days} days")
+        conn = app.get_db()
+        middle = start + (now - start) / 2
+        print(f"{'query':<28} {'ledger ms':>10} {'scan ms':>9}")
+        cases = (
+            ('stock now', lambda: app.stock_at(conn, now), lambda: full_scan_stock(conn, now)),
+            ('stock mid-history', lambda: app.stock_at(conn, middle), lambda: full_scan_stock(conn, middle)),
+            ('consumption last 7 days', lambda: app.stock_consumption(conn, now - timedelta(days=7), now),
+             lambda: full_scan_consumption(conn, now - timedelta(days=7), now)),
+            ('forecast 14 days', lambda: app.stock_forecast(conn, 14, now), None),
+        )
+        for name, ledger, scan in cases:
+            scan_ms = f"{timed(scan, args.repeat):>9.2f}" if scan else f"{'-':>9}"
+            print(f"{name:<28} {timed(ledger, args.repeat):>10.2f} {scan_ms}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
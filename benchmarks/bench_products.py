@@ -0,0 +1,116 @@
+"""Benchmark GET /api/products availability: legacy N+1 queries vs joined query.
+
+Usage: python benchmarks/bench_products.py [--sizes 10,100,1000] [--recipes 4] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+def legacy_get_products(category_id=None):
+    conn = app.get_db()
+    query = "SELECT * FROM products WHERE is_active=1"
+    params = []
+    if category_id:
+        query += " AND category_id=?"
+        params.append(category_id)
+    products = conn.execute(query, params).fetchall()
+    availability = {}
+    for prod in products:
+        recipes = conn.execute(
+            "SELECT ingredient_id, quantity_required FROM recipes WHERE product_id=?",
+            (prod['product_id'],),
+        ).fetchall()
+        if not recipes:
+            availability[prod['product_id']] = None
+            continue
+        possible_counts = []
+        for r in recipes:
+            ingredient = conn.execute(
+                "SELECT current_stock FROM ingredients WHERE ingredient_id=?",
+                (r['ingredient_id'],),
+            ).fetchone()
+            possible_counts.append(int(ingredient['current_stock'] // r['quantity_required']))
+        availability[prod['product_id']] = min(possible_counts) if possible_counts else None
+    conn.close()
+    for prod in products:
+        prod['max_available'] = availability.get(prod['product_id'])
+    return products
+
+
+def populate(menu_size, recipes_per_product):
+    conn = app.get_db()
+    ingredient_ids = [r['ingredient_id'] for r in conn.execute("SELECT ingredient_id FROM ingredients")]
+    rnd = random.Random(menu_size)
+    cur = conn.cursor()
+    for n in range(menu_size):
+        cur.execute(
+            "INSERT INTO products (category_id, name, description, price, is_active) VALUES (?,?,?,?,1)",
+            (rnd.randint(1, 4), f"Bench product {n}", "", 50.0),
+        )
+        product_id = cur.lastrowid
+        cur.executemany(
+            "INSERT INTO recipes (product_id, ingredient_id, quantity_required) VALUES (?,?,?)",
+            [
+                (product_id, ing, round(rnd.uniform(0.01, 1.0), 3))
+                for ing in rnd.sample(ingredient_ids, min(recipes_per_product, len(ingredient_ids)))
+            ],
+        )
+    conn.commit()
+    conn.close()
+
+
+def measure(fn, repeat, category_id=None):
+    statements = []
+    original_get_db = app.get_db
+
+    def counting_get_db():
+        conn = original_get_db()
+        conn.set_trace_callback(lambda sql: statements.append(sql))
+        return conn
+
+    app.get_db = counting_get_db
+    try:
+        result = fn(category_id)
+        per_call = len(statements)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(category_id)
+        elapsed = (time.perf_counter() - start) / repeat
+    finally:
+        app.get_db = original_get_db
+    return result, per_call, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,1000')
+    parser.add_argument('--recipes', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'menu':>6} {'filter':>8} {'legacy q':>9} {'legacy ms':>10} {'new q':>6} {'new ms':>8} {'speedup':>8}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp:
+            app.DB_PATH = os.path.join(tmp, 'bench.sqlite')
+            app.ensure_db()
+            populate(size, args.recipes)
+            for category_id in (None, 1):
+                legacy, legacy_q, legacy_t = measure(legacy_get_products, args.repeat, category_id)
+                current, new_q, new_t = measure(app.get_products, args.repeat, category_id)
+                assert legacy == current, "availability mismatch"
+                print(
+                    f"{size:>6} {str(category_id or '-'):>8} {legacy_q:>9} {legacy_t * 1000:>10.2f} "
+                    f"{new_q:>6} {new_t * 1000:>8.2f} {legacy_t / new_t:>7.1f}x"
+                )
+
+
+if __name__ == '__main__':
+    main()
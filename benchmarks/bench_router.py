@@ -0,0 +1,100 @@
+"""Microbenchmark of route dispatch: compiled router vs the old linear if-chain.
+
+Usage: python benchmarks/bench_router.py [--lookups 50000] [--extra 0,50,200]
+"""
+import argparse
+import os
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+SAMPLE_REQUESTS = (
+    ('GET', '/api/products?category_id=1'),
+    ('POST', '/api/orders'),
+    ('GET', '/api/orders?limit=20'),
+    ('PUT', '/api/ingredients/17'),
+    ('POST', '/api/products/5/recipes'),
+    ('GET', '/api/reports/sales?group_by=day'),
+)
+
+
+def extra_routes(count):
+    routes = []
+    for index in range(count):
+        routes.append(('GET', f'/api/extra{index}', None, app.STAFF))
+        routes.append(('PUT', f'/api/extra{index}/{{item_id:int}}', None, app.ADMIN))
+    return routes
+
+
+def linear_chain(count):
+    """Predicates in the shape of the old do_GET/do_POST/do_PUT branches, extra endpoints checked first."""
+    checks = []
+    for index in range(count):
+        checks.append(('GET', lambda path, p=f'/api/extra{index}': urlparse(path).path == p))
+        checks.append(('PUT', lambda path, p=f'/api/extra{index}/': path.startswith(p)))
+    checks += [
+        ('POST', lambda path: path.startswith('/api/auth/login')),
+        ('POST', lambda path: path == '/api/orders'),
+        ('POST', lambda path: path == '/api/products'),
+        ('POST', lambda path: path == '/api/employees'),
+        ('POST', lambda path: path == '/api/metrics/profiler'),
+        ('POST', lambda path: path in app.BULK_IMPORTS),
+        ('POST', lambda path: path == '/api/ingredients'),
+        ('POST', lambda path: path.startswith('/api/products/') and path.endswith('/recipes')),
+        ('PUT', lambda path: path.startswith('/api/ingredients/')),
+        ('PUT', lambda path: path.startswith('/api/products/')),
+        ('GET', lambda path: urlparse(path).path == '/api/orders'),
+        ('GET', lambda path: urlparse(path).path in ('/api/metrics', '/api/metrics/profile')),
+        ('GET', lambda path: path.startswith('/api/products')),
+        ('GET', lambda path: urlparse(path).path == '/api/ingredients'),
+        ('GET', lambda path: path.startswith('/api/reports/sales')),
+    ]
+
+    def match(method, path):
+        for check_method, check in checks:
+            if check_method == method and check(path):
+                return check
+        return None
+
+    return match
+
+
+def measure(match, lookups):
+    requests = [(method, path) for method, path in SAMPLE_REQUESTS]
+    rounds = max(lookups // len(requests), 1)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for method, path in requests:
+            match(method, path)
+    return (time.perf_counter() - start) / (rounds * len(requests)) * 1e6
+
+
+def compiled(router):
+    def match(method, path):
+        route, params, _ = router.match(method, path.partition('?')[0])
+        assert route is not None, (method, path)
+        return route
+
+    return match
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lookups', type=int, default=50000)
+    parser.add_argument('--extra', default='0,50,200', help="comma-separated counts of synthetic endpoint pairs")
+    args = parser.parse_args()
+
+    print(f"{'endpoints':>9}  {'linear us':>10}  {'router us':>10}")
+    for count in (int(value) for value in args.extra.split(',')):
+        router = app.Router(list(app.ROUTES) + extra_routes(count))
+        linear_us = measure(linear_chain(count), args.lookups)
+        router_us = measure(compiled(router), args.lookups)
+        print(f"{len(app.ROUTES) + 2 * count:>9}  {linear_us:>10.2f}  {router_us:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
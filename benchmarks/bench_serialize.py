@@ -0,0 +1,85 @@
+"""Benchmark row materialization and JSON encoding for the catalog listings.
+
+Compares the legacy path (per-row description walk + json.dumps) with the cached-key
+dict rows and the columnar format, each through the stdlib encoder and orjson when installed.
+
+Usage: python benchmarks/bench_serialize.py [--rows 5000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+def legacy_dict_factory(cursor, row):
+    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+
+
+def legacy_ingredients():
+    conn = app.get_db()
+    conn.row_factory = legacy_dict_factory
+    data = conn.execute("SELECT * FROM ingredients").fetchall()
+    conn.close()
+    return json.dumps(data).encode()
+
+
+def stdlib_dump(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def populate(rows):
+    conn = app.get_db()
+    conn.executemany(
+        "INSERT INTO ingredients (name, current_stock, unit, warning_threshold) VALUES (?,?,?,?)",
+        [(f"Інгредієнт {n}", 100.0 + n, 'g', 5.0) for n in range(rows)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(fn, repeat):
+    fn()
+    start = time.process_time()
+    for _ in range(repeat):
+        size = len(fn())
+    cpu = (time.process_time() - start) / repeat
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    encoders = [('stdlib', stdlib_dump)]
+    if app.orjson is not None:
+        encoders.append(('orjson', app.dump_json))
+    cases = [('legacy dicts + json.dumps', legacy_ingredients)]
+    for name, encode in encoders:
+        cases.append((f'dict rows + {name}', lambda encode=encode: encode(app.list_ingredients())))
+        cases.append((f'columnar + {name}', lambda encode=encode: encode(app.list_ingredients(columnar=True))))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.DB_PATH = os.path.join(tmp, 'bench.sqlite')
+        app.ensure_db()
+        populate(args.rows)
+        print(f"{'GET /api/ingredients':<28} {'cpu ms':>8} {'peak KiB':>9} {'bytes':>9}")
+        for name, fn in cases:
+            cpu, peak, size = measure(fn, args.repeat)
+            print(f"{name:<28} {cpu * 1000:>8.2f} {peak / 1024:>9.0f} {size:>9}")
+
+
+if __name__ == '__main__':
+    main()
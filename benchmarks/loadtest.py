@@ -0,0 +1,460 @@
+"""Load-test harness for the app.py HTTP API.
+
+Builds (or reuses) a synthetic database, starts the server in this process,
+drives scripted workloads from separate client processes and writes a JSON
+report with throughput, latency percentiles and SQL statements per request
+for every route.
+
+Usage:
+    python benchmarks/loadtest.py --orders 2000000 --duration 30 --output baseline.json
+    python benchmarks/loadtest.py --db /tmp/bench.sqlite --reuse --server asyncio \\
+        --output asyncio.json --baseline baseline.json
+    python benchmarks/loadtest.py --db /tmp/bench.sqlite --reuse --server pool --baristas 200 --admins 8
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+BENCH_PASSWORD = 'bench123'
+PAYMENT_METHODS = ('Card', 'Cash', 'App')
+
+
+def build_dataset(path, products, ingredients, orders, employees, days, seed=42):
+    rnd = random.Random(seed)
+    app.DB_PATH = path
+    app.ensure_db()
+    conn = app.get_db()
+    conn.execute("BEGIN")
+    first_ingredient = conn.execute(
+        "SELECT COALESCE(MAX(ingredient_id), 0) + 1 AS next_id FROM ingredients"
+    ).fetchone()['next_id']
+    conn.executemany(
+        "INSERT INTO ingredients (name, current_stock, unit, warning_threshold) VALUES (?,?,?,?)",
+        [(f"Bench ingredient {n}", 1e9, 'kg', 10.0) for n in range(ingredients)],
+    )
+    ingredient_ids = list(range(first_ingredient, first_ingredient + ingredients))
+    first_product = conn.execute("SELECT COALESCE(MAX(product_id), 0) + 1 AS next_id FROM products").fetchone()['next_id']
+    conn.executemany(
+        "INSERT INTO products (category_id, name, description, price, is_active) VALUES (?,?,?,?,1)",
+        [(rnd.randint(1, 4), f"Bench product {n}", "", float(rnd.randint(30, 150))) for n in range(products)],
+    )
+    product_rows = conn.execute("SELECT product_id, price FROM products").fetchall()
+    conn.executemany(
+        "INSERT INTO recipes (product_id, ingredient_id, quantity_required) VALUES (?,?,?)",
+        [
+            (product_id, ingredient_id, round(rnd.uniform(0.001, 0.5), 3))
+            for product_id in range(first_product, first_product + products)
+            for ingredient_id in rnd.sample(ingredient_ids, min(rnd.randint(2, 6), len(ingredient_ids)))
+        ],
+    )
+    password_hash = app.hash_password(BENCH_PASSWORD)
+    conn.executemany(
+        "INSERT INTO employees (name, role, phone, password_hash, is_active) VALUES (?,?,?,?,1)",
+        [(f"Bench barista {n}", 'Barista', f"+38050{n:07d}", password_hash) for n in range(employees)],
+    )
+    employee_ids = [r['employee_id'] for r in conn.execute("SELECT employee_id FROM employees")]
+    next_order = conn.execute("SELECT COALESCE(MAX(order_id), 0) + 1 AS next_id FROM orders").fetchone()['next_id']
+    start = datetime.utcnow() - timedelta(days=days)
+    span = days * 86400
+    batch = 50000
+    for offset in range(0, orders, batch):
+        order_rows = []
+        detail_rows = []
+        for order_id in range(next_order + offset, next_order + min(offset + batch, orders)):
+            lines = rnd.sample(product_rows, rnd.randint(1, 3))
+            total = 0.0
+            for product in lines:
+                quantity = rnd.randint(1, 2)
+                total += product['price'] * quantity
+                detail_rows.append((order_id, product['product_id'], quantity, product['price']))
+            moment = start + timedelta(seconds=rnd.randrange(span))
+            order_rows.append((
+                order_id, rnd.choice(employee_ids), moment.strftime('%Y-%m-%d %H:%M:%S'),
+                total, rnd.choice(PAYMENT_METHODS), 'Paid',
+            ))
+        conn.executemany(
+            "INSERT INTO orders (order_id, employee_id, order_date, total_amount, payment_method, status) "
+            "VALUES (?,?,?,?,?,?)",
+            order_rows,
+        )
+        conn.executemany(
+            "INSERT INTO order_details (order_id, product_id, quantity, price_at_sale) VALUES (?,?,?,?)",
+            detail_rows,
+        )
+    conn.commit()
+    app.rebuild_sales_rollups(conn)
+    conn.execute("ANALYZE")
+    conn.close()
+    app.close_db_pool()
+
+
+def route_key(method, path):
+    path = path.split('?', 1)[0]
+    return f"{method} " + re.sub(r'/\d+(?=/|$)', '/{id}', path)
+
+
+class SqlCounter:
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.by_route = {}
+
+    def install(self):
+        counter = self
+        original_get_db = app.get_db
+
+        def counting_get_db():
+            conn = original_get_db()
+            conn.set_trace_callback(counter.count)
+            return conn
+
+        class CountingHandler(app.AppHandler):
+            def handle_one_request(self):
+                counter.local.statements = 0
+                self.command = None
+                super().handle_one_request()
+                if self.command:
+                    counter.record(route_key(self.command, self.path), counter.local.statements)
+
+            def log_message(self, format, *args):
+                pass
+
+        app.get_db = counting_get_db
+        app.AppHandler = CountingHandler
+
+    def count(self, statement):
+        self.local.statements = getattr(self.local, 'statements', 0) + 1
+
+    def record(self, route, statements):
+        with self.lock:
+            entry = self.by_route.setdefault(route, [0, 0])
+            entry[0] += 1
+            entry[1] += statements
+
+    def reset(self):
+        with self.lock:
+            self.by_route.clear()
+
+
+def start_server(mode, port):
+    if mode == 'asyncio':
+        target = lambda: app.serve_asyncio('127.0.0.1', port)  # noqa: E731
+    elif mode == 'pool':
+        target = lambda: app.serve_pool('127.0.0.1', port)  # noqa: E731
+    else:
+        target = lambda: app.serve_threading('127.0.0.1', port)  # noqa: E731
+    threading.Thread(target=target, daemon=True).start()
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Client:
+    def __init__(self, port, token=None):
+        self.port = port
+        self.token = token
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    self.conn.close()
+                    self.conn = None
+                return response, data
+            except (http.client.HTTPException, ConnectionError, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def login(self, phone, password):
+        # Hundreds of clients logging in at once get shed; honour Retry-After like a real client
+        for _ in range(30):
+            response, data = self.request('POST', '/api/auth/login', {'phone': phone, 'password': password})
+            if response.status != 503:
+                break
+            time.sleep(float(response.getheader('Retry-After') or 1))
+        self.token = json.loads(data)['token']
+
+
+def scenario_requests(kind, rnd, context):
+    if kind == 'barista':
+        category = rnd.choice([None, 1, 2, 3, 4])
+        yield 'GET', '/api/products' + (f'?category_id={category}' if category else ''), None, {}
+        if rnd.random() < 0.2:
+            yield 'GET', '/api/ingredients', None, {}
+    elif kind == 'checkout':
+        items = [
+            {'product_id': rnd.choice(context['product_ids']), 'quantity': rnd.randint(1, 2)}
+            for _ in range(rnd.randint(1, 3))
+        ]
+        yield 'POST', '/api/orders', {'items': items, 'payment_method': rnd.choice(PAYMENT_METHODS)}, {}
+    elif kind == 'admin':
+        period = rnd.choice(['day', 'week', 'month'])
+        group_by = rnd.choice(['', '&group_by=product', '&group_by=payment_method', '&group_by=employee'])
+        yield 'GET', f'/api/reports/sales?period={period}{group_by}', None, {}
+        yield 'GET', '/api/orders?limit=50', None, {}
+    elif kind == 'login':
+        phone = rnd.choice(context['phones'])
+        yield 'POST', '/api/auth/login', {'phone': phone, 'password': context['passwords'][phone]}, {}
+
+
+def run_client(kind, threads, port, context, duration, warmup, results, seed):
+    def worker(index):
+        rnd = random.Random(seed * 1000 + index)
+        client = Client(port)
+        if kind != 'login':
+            phone = context['admin_phone'] if kind == 'admin' else rnd.choice(context['barista_phones'])
+            client.login(phone, context['passwords'][phone])
+        samples = []
+        errors = {}
+        started = time.perf_counter()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+        while True:
+            for method, path, body, headers in scenario_requests(kind, rnd, context):
+                begin = time.perf_counter()
+                if begin >= stop_at:
+                    local_results.append((samples, errors))
+                    return
+                try:
+                    response, _ = client.request(method, path, body, headers)
+                    status = response.status
+                except Exception:
+                    status = 0
+                elapsed = time.perf_counter() - begin
+                if begin >= measure_from:
+                    key = route_key(method, path)
+                    samples.append((key, elapsed))
+                    if status >= 400 or status == 0:
+                        errors[f"{key} {status}"] = errors.get(f"{key} {status}", 0) + 1
+
+    local_results = []
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    samples = [s for chunk, _ in local_results for s in chunk]
+    errors = {}
+    for _, chunk in local_results:
+        for key, value in chunk.items():
+            errors[key] = errors.get(key, 0) + value
+    results.put((kind, samples, errors))
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * (len(values) - 1)))))
+    return values[index]
+
+
+def summarize(samples, errors, sql, duration):
+    routes = {}
+    grouped = {}
+    for key, elapsed in samples:
+        grouped.setdefault(key, []).append(elapsed)
+    for key, latencies in sorted(grouped.items()):
+        latencies.sort()
+        error_count = sum(v for k, v in errors.items() if k.rsplit(' ', 1)[0] == key)
+        requests, statements = sql.get(key, (0, 0))
+        routes[key] = {
+            'requests': len(latencies),
+            'errors': error_count,
+            'throughput_rps': round(len(latencies) / duration, 2),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'max_ms': round(latencies[-1] * 1000, 3),
+            'sql_per_request': round(statements / requests, 2) if requests else None,
+        }
+    total = sum(r['requests'] for r in routes.values())
+    return routes, {
+        'requests': total,
+        'errors': sum(errors.values()),
+        'throughput_rps': round(total / duration, 2),
+        'error_breakdown': errors,
+    }
+
+
+def print_report(report, baseline=None):
+    header = f"{'route':<34} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sql/req':>8}"
+    print(header)
+    print('-' * len(header))
+    for key, route in report['routes'].items():
+        line = (
+            f"{key:<34} {route['throughput_rps']:>9.1f} {route['p50_ms']:>9.2f} "
+            f"{route['p95_ms']:>9.2f} {route['p99_ms']:>9.2f} {route['sql_per_request'] or 0:>8.1f}"
+        )
+        old = (baseline or {}).get('routes', {}).get(key)
+        if old:
+            def delta(name):
+                return (route[name] - old[name]) / old[name] * 100 if old[name] else 0.0
+            line += f"   rps {delta('throughput_rps'):+.0f}%  p99 {delta('p99_ms'):+.0f}%"
+        print(line)
+    totals = report['totals']
+    print(f"total: {totals['requests']} requests, {totals['throughput_rps']:.1f} rps, {totals['errors']} errors")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help="database file to build or reuse (default: temporary file)")
+    parser.add_argument('--reuse', action='store_true', help="reuse --db if it already exists")
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--ingredients', type=int, default=300)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--employees', type=int, default=30)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--server', choices=('threading', 'asyncio', 'pool'), default='threading')
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--baristas', type=int, default=8, help="threads polling the menu")
+    parser.add_argument('--tills', type=int, default=4, help="threads posting checkouts")
+    parser.add_argument('--admins', type=int, default=1, help="threads running reports")
+    parser.add_argument('--logins', type=int, default=2, help="threads running a login storm")
+    parser.add_argument('--output', help="write the JSON report here")
+    parser.add_argument('--baseline', help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    tmp = None
+    path = args.db
+    if not path:
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, 'bench.sqlite')
+    if not (args.reuse and os.path.exists(path)):
+        if os.path.exists(path):
+            os.remove(path)
+        started = time.perf_counter()
+        build_dataset(path, args.products, args.ingredients, args.orders, args.employees, args.days)
+        print(f"dataset built in {time.perf_counter() - started:.1f}s: {path}", file=sys.stderr)
+    app.DB_PATH = path
+    app.ensure_db()
+
+    conn = app.get_db()
+    context = {
+        'product_ids': [r['product_id'] for r in conn.execute(
+            "SELECT product_id FROM products WHERE is_active=1 AND name LIKE 'Bench product%'"
+        )] or [1, 2, 3],
+        'barista_phones': [r['phone'] for r in conn.execute(
+            "SELECT phone FROM employees WHERE role='Barista' AND phone LIKE '+38050%'"
+        )],
+        'admin_phone': '+380991234567',
+        'sizes': conn.execute(
+            "SELECT (SELECT COUNT(*) FROM products) AS products, (SELECT COUNT(*) FROM orders) AS orders"
+        ).fetchone(),
+    }
+    conn.close()
+    context['phones'] = context['barista_phones'] or ['+380997654321']
+    context['passwords'] = {phone: BENCH_PASSWORD for phone in context['barista_phones']}
+    context['passwords'].update({'+380991234567': 'admin123', '+380997654321': 'barista123'})
+    if not context['barista_phones']:
+        context['barista_phones'] = ['+380997654321']
+
+    sql = SqlCounter()
+    sql.install()
+    port = free_port()
+    start_server(args.server, port)
+
+    mp = multiprocessing.get_context('spawn')
+    results = mp.Queue()
+    workloads = [
+        ('barista', args.baristas), ('checkout', args.tills), ('admin', args.admins), ('login', args.logins),
+    ]
+    processes = [
+        mp.Process(target=run_client, args=(kind, threads, port, context, args.duration, args.warmup, results, n))
+        for n, (kind, threads) in enumerate(workloads) if threads
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(args.warmup)
+    sql.reset()
+    samples = []
+    errors = {}
+    for _ in processes:
+        _, chunk, chunk_errors = results.get()
+        samples += chunk
+        for key, value in chunk_errors.items():
+            errors[key] = errors.get(key, 0) + value
+    for process in processes:
+        process.join()
+
+    routes, totals = summarize(samples, errors, dict(sql.by_route), args.duration)
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'revision': git_revision(),
+            'server': args.server,
+            'duration_s': args.duration,
+            'workload': dict(workloads),
+            'dataset': context['sizes'],
+            'python': sys.version.split()[0],
+            'sqlite': app.sqlite3.sqlite_version,
+        },
+        'routes': routes,
+        'totals': totals,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if tmp:
+        app.close_db_pool()
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import http.client
+import json
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A freshly seeded database in tmp_path; yields a pooled connection to it."""
+    monkeypatch.setattr(app, 'DB_PATH', str(tmp_path / 'database.sqlite'))
+    app.ensure_db()
+    conn = app.get_db()
+    yield conn
+    conn.close()
+    app.close_db_pool()
+
+
+class Client:
+    def __init__(self, port):
+        self.port = port
+        self.token = None
+
+    def request(self, method, path, body=None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+        try:
+            connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read() or b'null')
+        finally:
+            connection.close()
+
+
+@pytest.fixture
+def admin(db):
+    """An HTTP client logged in as the seeded admin against a threading server on a free port."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), app.AppHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = Client(server.server_address[1])
+    status, data = client.request('POST', '/api/auth/login', {'phone': '+380991234567', 'password': 'admin123'})
+    assert status == 200
+    client.token = data['token']
+    yield client
+    server.shutdown()
+    server.server_close()
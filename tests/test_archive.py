@@ -0,0 +1,71 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app
+
+LATER = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=1)
+
+
+def counts(conn):
+    return {
+        tier: conn.execute(f"SELECT COUNT(*) AS n FROM {tier}.orders").fetchone()['n']
+        for tier in app.ORDER_TIERS
+    }
+
+
+def visible(conn):
+    listed = app.list_orders(conn, {}, limit=100)['orders']
+    streamed = list(app.iter_orders(conn, {}))
+    return (
+        sorted(order['order_id'] for order in listed),
+        sorted(order['order_id'] for order in streamed),
+        conn.execute("SELECT COUNT(*) AS n FROM all_orders").fetchone()['n'],
+        conn.execute("SELECT COUNT(*) AS n FROM all_order_details").fetchone()['n'],
+        conn.execute("SELECT SUM(total_amount) AS total FROM all_orders").fetchone()['total'],
+    )
+
+
+def test_archive_moves_orders(db):
+    before = visible(db)
+    assert app.archive_orders(db, LATER, batch_size=2) == 3
+    assert counts(db) == {'main': 0, 'archive': 3}
+    assert visible(db) == before
+
+
+def test_error_mid_batch_rolls_back_both_tiers(db):
+    before = visible(db)
+
+    def deny_hot_delete(action, table, column, database, source):
+        if action == sqlite3.SQLITE_DELETE and table == 'orders' and database == 'main':
+            return sqlite3.SQLITE_DENY
+        return sqlite3.SQLITE_OK
+
+    db.set_authorizer(deny_hot_delete)
+    try:
+        with pytest.raises(sqlite3.DatabaseError):
+            app.archive_orders(db, LATER)
+    finally:
+        db.set_authorizer(None)
+    assert counts(db) == {'main': 3, 'archive': 0}
+    assert visible(db) == before
+
+
+def test_copy_committed_without_delete_is_not_double_counted(db):
+    # What a crash between the two files' commits leaves behind: orders copied but still hot
+    before = visible(db)
+    db.execute("BEGIN IMMEDIATE")
+    db.execute(f"INSERT INTO archive.orders ({app.ORDER_TABLE_COLUMNS}) "
+               f"SELECT {app.ORDER_TABLE_COLUMNS} FROM main.orders WHERE order_id <= 2")
+    db.execute(f"INSERT INTO archive.order_details ({app.ORDER_DETAIL_COLUMNS}) "
+               f"SELECT {app.ORDER_DETAIL_COLUMNS} FROM main.order_details WHERE order_id <= 2")
+    db.commit()
+    assert counts(db) == {'main': 3, 'archive': 2}
+    assert visible(db) == before
+    app.rebuild_sales_rollups(db)
+    assert db.execute("SELECT SUM(order_count) AS n FROM sales_rollup WHERE granularity = 'day'").fetchone()['n'] == 3
+
+    assert app.archive_orders(db, LATER) == 3
+    assert counts(db) == {'main': 0, 'archive': 3}
+    assert visible(db) == before
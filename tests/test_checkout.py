@@ -0,0 +1,50 @@
+import pytest
+
+import app
+
+ARABICA, MILK, CUP_L = 1, 3, 8
+LATTE = 4  # 0.02 arabica, 0.25 milk, one large cup
+
+
+def set_stock(conn, levels):
+    conn.executemany("UPDATE ingredients SET current_stock = ? WHERE ingredient_id = ?",
+                     [(stock, ingredient_id) for ingredient_id, stock in levels.items()])
+    conn.commit()
+
+
+def stock(conn, *ingredient_ids):
+    return {
+        row['ingredient_id']: row['current_stock']
+        for row in conn.execute("SELECT ingredient_id, current_stock FROM ingredients")
+        if row['ingredient_id'] in ingredient_ids
+    }
+
+
+def test_checkout_deducts_recipe(db):
+    before = stock(db, ARABICA, MILK, CUP_L)
+    order_id, total = app.checkout(db, 1, [{'product_id': LATTE, 'quantity': 2}])
+    after = stock(db, ARABICA, MILK, CUP_L)
+    assert total == 130.0
+    assert after[ARABICA] == pytest.approx(before[ARABICA] - 0.04)
+    assert after[MILK] == pytest.approx(before[MILK] - 0.5)
+    assert after[CUP_L] == pytest.approx(before[CUP_L] - 2)
+
+
+def test_shortage_reports_only_short_ingredients_with_untouched_levels(db):
+    set_stock(db, {ARABICA: 0.01, MILK: 0.3})
+    orders = db.execute("SELECT COUNT(*) AS n FROM orders").fetchone()['n']
+    before = stock(db, ARABICA, MILK, CUP_L)
+    with pytest.raises(app.StockShortageError) as exc:
+        app.checkout(db, 1, [{'product_id': LATTE, 'quantity': 1}])
+    assert [(row['ingredient_id'], row['available'], row['required']) for row in exc.value.shortages] == [
+        (ARABICA, 0.01, 0.02)
+    ]
+    assert stock(db, ARABICA, MILK, CUP_L) == before
+    assert db.execute("SELECT COUNT(*) AS n FROM orders").fetchone()['n'] == orders
+
+
+def test_shortage_lists_every_short_ingredient(db):
+    set_stock(db, {ARABICA: 0.01, MILK: 0.2})
+    with pytest.raises(app.StockShortageError) as exc:
+        app.checkout(db, 1, [{'product_id': LATTE, 'quantity': 1}])
+    assert [row['ingredient_id'] for row in exc.value.shortages] == [ARABICA, MILK]
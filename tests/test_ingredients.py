@@ -0,0 +1,33 @@
+import app
+
+MILK = 3
+
+
+def stock(conn, ingredient_id):
+    return conn.execute(
+        "SELECT current_stock FROM ingredients WHERE ingredient_id = ?", (ingredient_id,)
+    ).fetchone()['current_stock']
+
+
+def test_non_numeric_stock_is_rejected_and_leaves_no_lock(db, admin, monkeypatch):
+    monkeypatch.setattr(app, 'DB_BUSY_TIMEOUT', 0.5)
+    before = stock(db, MILK)
+    status, data = admin.request('PUT', f'/api/ingredients/{MILK}', {
+        'name': 'Молоко 2.5%', 'unit': 'l', 'current_stock': 'багато', 'warning_threshold': 5,
+    })
+    assert status == 400 and data['error']
+    assert stock(db, MILK) == before
+    status, data = admin.request('POST', '/api/orders', {'items': [{'product_id': 3, 'quantity': 1}]})
+    assert status == 200, data
+
+
+def test_numeric_strings_are_accepted(db, admin):
+    status, _ = admin.request('PUT', f'/api/ingredients/{MILK}', {
+        'name': 'Молоко 2.5%', 'unit': 'l', 'current_stock': '12,5', 'warning_threshold': '2',
+    })
+    assert status == 200
+    assert stock(db, MILK) == 12.5
+    movement = db.execute(
+        "SELECT kind, quantity FROM stock_movements WHERE ingredient_id = ? ORDER BY movement_id DESC LIMIT 1", (MILK,)
+    ).fetchone()
+    assert movement == {'kind': 'correction', 'quantity': 12.5 - 40.0}
@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def writer(db):
+    return app.OrderWriter(batch_size=8, window=0.001, timeout=5)
+
+
+def test_writer_survives_a_failing_batch(db, writer, monkeypatch):
+    calls = []
+    real_get_db = app.get_db
+
+    def flaky_get_db():
+        calls.append(1)
+        if len(calls) == 1:
+            raise app.sqlite3.OperationalError("unable to open database file")
+        return real_get_db()
+
+    monkeypatch.setattr(app, 'get_db', flaky_get_db)
+    with pytest.raises(app.sqlite3.OperationalError):
+        writer.submit(1, [{'product_id': 2, 'quantity': 1}])
+    order_id, total = writer.submit(1, [{'product_id': 2, 'quantity': 1}])
+    assert total == 45.0
+    assert writer.thread.is_alive()
+
+
+def test_caller_gives_up_after_timeout(db, monkeypatch):
+    writer = app.OrderWriter(batch_size=1, window=0, timeout=0.2)
+    release = threading.Event()
+    monkeypatch.setattr(writer, 'write', lambda conn, batch: release.wait(5))
+    with pytest.raises(TimeoutError):
+        writer.submit(1, [{'product_id': 2, 'quantity': 1}])
+    release.set()
@@ -0,0 +1,67 @@
+import json
+import socket
+import threading
+
+import pytest
+
+import app
+
+
+def head(method, path, *headers):
+    return "\r\n".join([f"{method} {path} HTTP/1.1", "Host: test", *headers, "", ""]).encode()
+
+
+@pytest.mark.parametrize('method, path, expected', [
+    ('POST', '/api/orders', app.CHECKOUT),
+    ('GET', '/api/products', app.INTERACTIVE),
+    ('GET', '/api/orders?limit=5', app.INTERACTIVE),
+    ('HEAD', '/index.html', app.INTERACTIVE),
+    ('GET', '/', app.INTERACTIVE),
+    ('POST', '/api/products/bulk', app.BACKGROUND),
+])
+def test_request_priority(method, path, expected):
+    assert app.request_priority(head(method, path)) == (expected, False)
+
+
+def test_event_stream_is_a_stream():
+    assert app.request_priority(head('GET', '/api/events?token=x'))[1] is True
+
+
+@pytest.fixture
+def pool(db):
+    server = app.PoolServer('127.0.0.1', 0, workers=2, reserved=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.listener.getsockname()[1]
+    server.shutdown()
+    thread.join(5)
+
+
+def exchange(port, data):
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        sock.sendall(data)
+        response = b''
+        while chunk := sock.recv(65536):
+            response += chunk
+    status_line, _, rest = response.partition(b'\r\n')
+    headers, _, body = rest.partition(b'\r\n\r\n')
+    return int(status_line.split()[1]), headers.decode().lower(), body
+
+
+def test_oversized_body_is_refused_before_it_is_sent(pool, monkeypatch):
+    monkeypatch.setattr(app, 'MAX_REQUEST_BODY', 1024)
+    status, headers, body = exchange(pool, head('POST', '/api/orders', 'Content-Length: 1048576'))
+    assert status == 413
+    assert 'retry-after' not in headers
+    assert json.loads(body)['error']
+
+
+def test_oversized_head_is_refused(pool, monkeypatch):
+    monkeypatch.setattr(app, 'MAX_REQUEST_HEAD', 1024)
+    status, _, _ = exchange(pool, head('GET', '/api/products', 'X-Padding: ' + 'a' * 2048))
+    assert status == 431
+
+
+def test_request_within_limits_is_served(pool):
+    status, _, body = exchange(pool, head('GET', '/api/products', 'Connection: close'))
+    assert status == 401
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import app
+
+
+def test_rollup_segments_align_ragged_edges_to_hours():
+    start, end = datetime(2024, 1, 1, 10, 30), datetime(2024, 1, 3, 5, 15, 20)
+    assert app.rollup_segments(start, end) == [
+        ('hour', datetime(2024, 1, 1, 10), datetime(2024, 1, 2)),
+        ('day', datetime(2024, 1, 2), datetime(2024, 1, 3)),
+        ('hour', datetime(2024, 1, 3), datetime(2024, 1, 3, 6)),
+    ]
+    assert app.rollup_segments(start, end, ('hour',)) == [
+        ('hour', datetime(2024, 1, 1, 10), datetime(2024, 1, 3, 6)),
+    ]
+
+
+def test_rollup_segments_within_one_day():
+    assert app.rollup_segments(datetime(2024, 1, 1, 10, 30), datetime(2024, 1, 1, 12)) == [
+        ('hour', datetime(2024, 1, 1, 10), datetime(2024, 1, 1, 12)),
+    ]
+    assert app.rollup_segments(datetime(2024, 1, 1), datetime(2024, 1, 3)) == [
+        ('day', datetime(2024, 1, 1), datetime(2024, 1, 3)),
+    ]
+
+
+def test_sales_report_echoes_the_summed_range(db, admin):
+    status, data = admin.request('GET', '/api/reports/sales?from=2024-01-01T10:30:00&to=2024-01-03T05:15:20')
+    assert status == 200, data
+    assert data['from'] == '2024-01-01 10:00:00'
+    assert data['to'] == '2024-01-03 06:00:00'
+
+
+def test_analytics_echo_whole_second_bounds(db, admin):
+    status, data = admin.request('GET', '/api/reports/margins?from=2024-01-01T10:30:00.250&to=2024-01-01T11:00:00.500')
+    assert status == 200, data
+    assert data['from'] == '2024-01-01 10:30:00'
+    assert data['to'] == '2024-01-01 11:00:01'
@@ -0,0 +1,47 @@
+import sqlite3
+
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize('name, sql, params', app.HOT_QUERIES, ids=[query[0] for query in app.HOT_QUERIES])
+def test_hot_query_uses_an_index(db, name, sql, params):
+    scans, plan = app.full_scans(db, sql, params)
+    assert not scans, [row['detail'] for row in plan]
+
+
+def test_unversioned_database_is_migrated_in_place(tmp_path, monkeypatch):
+    path = tmp_path / 'database.sqlite'
+    legacy = sqlite3.connect(path)
+    legacy.executescript(app.BASE_SCHEMA)
+    legacy.execute("INSERT INTO categories (name) VALUES ('Кава')")
+    legacy.execute("INSERT INTO employees (name, role, phone, password_hash) VALUES ('Олена', 'Admin', '+380', 'x')")
+    legacy.commit()
+    legacy.close()
+    monkeypatch.setattr(app, 'DB_PATH', str(path))
+    app.ensure_db()
+    conn = app.get_db()
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()['user_version'] == len(app.MIGRATIONS)
+        indexes = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'idx_employees_phone', 'idx_recipes_product', 'idx_orders_date'} <= indexes
+        assert conn.execute("SELECT COUNT(*) AS n FROM categories").fetchone()['n'] == 1
+    finally:
+        conn.close()
+        app.close_db_pool()
+
+
+def test_unseeded_database_takes_a_created_admin(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'DB_PATH', str(tmp_path / 'database.sqlite'))
+    monkeypatch.setattr(app, 'SEED_DEMO_DATA', False)
+    app.ensure_db()
+    conn = app.get_db()
+    try:
+        assert conn.execute("SELECT COUNT(*) AS n FROM employees").fetchone()['n'] == 0
+        app.create_employee(conn, 'Адмін', 'Admin', '+380500000001', 's3cret')
+    finally:
+        conn.close()
+    data, error = app.handle_login({'phone': '+380500000001', 'password': 's3cret'})
+    assert error is None and data['user']['role'] == 'Admin'
+    app.close_db_pool()